@@ -36,8 +36,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover every other middleware too
+    'servicenow_script_generator_app.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Add WhiteNoise for static files
+    'servicenow_script_generator_app.middleware.AsyncWhiteNoiseMiddleware',  # WhiteNoise for static files, async capable
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -50,7 +52,8 @@ ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates plus render timing for the /metrics endpoint
+        'BACKEND': 'servicenow_script_generator_app.metrics.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -68,14 +71,50 @@ WSGI_APPLICATION = 'config.wsgi.application'
 
 # Database configuration
 # Use DATABASE_URL from environment (.env on local, Render DATABASE_URL in production)
+DATABASE_URL = env('DATABASE_URL', default=f'sqlite:///{os.path.join(BASE_DIR, "db.sqlite3")}')
 DATABASES = {
-    'default': dj_database_url.config(
-        default=env('DATABASE_URL', default=f'sqlite:///{os.path.join(BASE_DIR, "db.sqlite3")}'),
+    'default': dj_database_url.parse(
+        DATABASE_URL,
         conn_max_age=600,
-        ssl_require=True
+        # SQLite has no SSL, the local fallback (and the tests) use it
+        ssl_require=not DATABASE_URL.startswith('sqlite')
     )
 }
 
+# Cache configuration
+# Generated scripts and tables (keyed by the catalog version, which lives in the
+# database) and import progress live here. Progress is polled from any worker, so
+# production defaults to the database cache (run `python manage.py createcachetable`
+# once), set CACHE_URL=rediscache://... for Redis. A per-process locmem cache is only
+# the default with DEBUG on, `manage.py check --deploy` warns about it.
+CACHES = {
+    'default': env.cache_url('CACHE_URL', default='locmemcache://' if DEBUG else 'dbcache://snow_cache'),
+}
+
+# Background CSV imports
+# Uploaded files are kept here until their import job finishes
+IMPORT_UPLOAD_DIR = env('IMPORT_UPLOAD_DIR', default=os.path.join(BASE_DIR, 'import_uploads'))
+# Imports replace whole tables, so by default they run one at a time. The pool is per
+# process: with several web workers, uploads sent to different workers can still overlap.
+IMPORT_WORKERS = env.int('IMPORT_WORKERS', default=1)
+# A queued or running job whose process stopped sending heartbeats for this long (a
+# deploy, a recycled worker, a crash) is marked failed and its upload deleted
+IMPORT_JOB_STALE_SECONDS = env.int('IMPORT_JOB_STALE_SECONDS', default=300)
+# Processes that parse large replace-mode CSV uploads in parallel, e.g. the number of
+# cores (1 = parse in the job thread). Smaller files aren't worth starting them for.
+IMPORT_PARSE_PROCESSES = env.int('IMPORT_PARSE_PROCESSES', default=1)
+IMPORT_PARALLEL_MIN_BYTES = env.int('IMPORT_PARALLEL_MIN_BYTES', default=16 * 1024 * 1024)
+
+# ASGI serving
+# config/asgi.py turns this on: exports, script generation and uploads use their async
+# versions, which hand the blocking work to a pool of this many threads
+ASYNC_VIEWS = env.bool('ASYNC_VIEWS', default=False)
+ASYNC_VIEW_WORKERS = env.int('ASYNC_VIEW_WORKERS', default=4)
+
+# Near-duplicate report: lowest similarity (0-1, difflib ratio of the names) reported,
+# the page and API take ?threshold= to override it
+DUPLICATE_THRESHOLD = env.float('DUPLICATE_THRESHOLD', default=0.85)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
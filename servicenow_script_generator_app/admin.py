@@ -1,10 +1,75 @@
-from django.contrib import admin
-from .models import Category, SubCategory
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ORDER_VAR
+from django.db.models import Case, IntegerField, When
+from .models import Category, SubCategory, ImportJob
+from .pagination import EstimatedCountPaginator
+from .search import get_index
+
+# Most matches an admin search or autocomplete returns, best first
+ADMIN_SEARCH_LIMIT = 500
+
+def rank_order(ids):
+    # Order by position in ids, the search index's best-first ranking
+    return Case(*[When(id=pk, then=position) for position, pk in enumerate(ids)], output_field=IntegerField())
+
+class CatalogAdmin(admin.ModelAdmin):
+    # Changelists and autocomplete over catalogs with 100k+ rows
+    paginator = EstimatedCountPaginator
+    # Skip the extra unfiltered COUNT(*) shown next to search results
+    show_full_result_count = False
+    # Primary key order is an index scan (and keeps autocomplete pages stable)
+    ordering = ("id",)
+    # search_fields turns on the search box and autocomplete, the lookup itself
+    # goes through the in-process search index (search.py) instead of icontains
+    search_fields = ("name",)
+    index_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        # One more than shown, to tell whether anything was cut off
+        ids = [result["id"] for result in get_index(self.index_kind).rank(search_term, ADMIN_SEARCH_LIMIT + 1)]
+        if len(ids) > ADMIN_SEARCH_LIMIT:
+            ids = ids[:ADMIN_SEARCH_LIMIT]
+            # Autocomplete only shows its first pages, the changelist says so
+            match = request.resolver_match
+            if not (match and match.url_name == "autocomplete"):
+                messages.warning(
+                    request,
+                    f"Only the best {ADMIN_SEARCH_LIMIT} matches for \u201c{search_term}\u201d are listed, "
+                    "narrow the search to find the rest.",
+                )
+        # Remembered for get_ordering, which the changelist applies afterwards
+        request._catalog_search_ids = ids
+        return queryset.filter(id__in=ids).order_by(rank_order(ids)), False
+
+    def get_ordering(self, request):
+        # While searching, best match first unless a column header was clicked
+        ids = getattr(request, "_catalog_search_ids", None)
+        if ids and ORDER_VAR not in request.GET:
+            return (rank_order(ids),)
+        return super().get_ordering(request)
 
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
-    list_display = ("name",)
+class CategoryAdmin(CatalogAdmin):
+    list_display = ("name", "sequence")
+    index_kind = "category"
 
 @admin.register(SubCategory)
-class SubCategoryAdmin(admin.ModelAdmin):
-    list_display = ("name", "category")
+class SubCategoryAdmin(CatalogAdmin):
+    list_display = ("name", "category", "sequence")
+    # "category" column and __str__ read the category, join it in the page query
+    list_select_related = ("category",)
+    # Search-as-you-type instead of a <select> with every category
+    autocomplete_fields = ("category",)
+    index_kind = "subcategory"
+
+    def get_queryset(self, request):
+        # Delete confirmations and other admin pages print __str__ too
+        return super().get_queryset(request).select_related("category")
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "status", "file_name", "rows_processed", "created_count", "created_at")
+    list_filter = ("kind", "status")
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.core.checks import Tags, register
+from django.db.backends.signals import connection_created
+
+class ServicenowScriptGeneratorAppConfig(AppConfig):
+  name = "servicenow_script_generator_app"
+
+  def ready(self):
+    from .checks import check_shared_cache
+    register(check_shared_cache, Tags.caches, deploy=True)
+    # Before any connection is made, so every one reports its queries to /metrics
+    from .metrics import install_query_hook
+    connection_created.connect(install_query_hook)
@@ -11,6 +11,8 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'servicenow_script_generator_app.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Route the heavy views to their async versions (see async_views.py)
+os.environ.setdefault('ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
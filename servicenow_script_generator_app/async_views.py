@@ -0,0 +1,162 @@
+import asyncio, contextvars, functools
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import JsonResponse, StreamingHttpResponse, Http404
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import content_disposition_header, http_date, quote_etag
+from . import views
+from .exports import write_excel_tempfile, category_export_rows, subcategory_export_rows, XLSX_CONTENT_TYPE
+from .patches import record_revision
+from .scripts import get_cached_scripts, load_script_mappings, iter_script_bytes, iter_scripts_zip, iter_gzip, SCRIPT_SOURCES
+
+# Async versions of the heavy views, routed instead of the sync ones when the
+# app is served over ASGI (settings.ASYNC_VIEWS). The event loop only shuffles
+# bytes; ORM queries and building sheets/scripts run on a bounded thread pool.
+
+# Size of the pool, so a burst of downloads can't open unlimited DB connections
+_executor = ThreadPoolExecutor(max_workers=settings.ASYNC_VIEW_WORKERS, thread_name_prefix="async-view")
+
+# Bytes read from an export temp file per chunk
+FILE_CHUNK_SIZE = 64 * 1024
+
+_DONE = object()
+
+def _run_in_pool(fn, args):
+  try:
+    return fn(*args)
+  finally:
+    # Same housekeeping Django does for request threads
+    close_old_connections()
+
+async def offload(fn, *args):
+  # Run fn(*args) on the pool, keeping the request's context (metrics)
+  loop = asyncio.get_running_loop()
+  context = contextvars.copy_context()
+  return await loop.run_in_executor(_executor, functools.partial(context.run, _run_in_pool, fn, args))
+
+async def aiter_in_pool(iterator):
+  # Advance a sync iterator on the pool, one chunk at a time
+  iterator = iter(iterator)
+  while True:
+    chunk = await offload(next, iterator, _DONE)
+    if chunk is _DONE:
+      return
+    yield chunk
+
+async def aiter_file(fileobj, chunk_size=FILE_CHUNK_SIZE):
+  try:
+    while True:
+      data = await offload(fileobj.read, chunk_size)
+      if not data:
+        return
+      yield data
+  finally:
+    fileobj.close()
+
+async def excel_response(title, filename, rows):
+  # Build the sheet on the pool, then stream the temp file back
+  tmp = await offload(lambda: write_excel_tempfile(title, rows()))
+  size = tmp.seek(0, 2)
+  tmp.seek(0)
+  response = StreamingHttpResponse(aiter_file(tmp), content_type=XLSX_CONTENT_TYPE)
+  response["Content-Length"] = size
+  response["Content-Disposition"] = content_disposition_header(True, filename)
+  return response
+
+async def generate_category_excel(request):
+  return await excel_response("Categories", "categories.xlsx", category_export_rows)
+
+async def generate_subcategory_excel(request):
+  return await excel_response("Subcategories", "subcategories.xlsx", subcategory_export_rows)
+
+async def conditional_response(request):
+  # Async stand-in for @condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified),
+  # which only wraps sync views in this Django version. Returns (304 response or None, etag, last_modified)
+  etag = quote_etag(await offload(views.catalog_etag, request))
+  last_modified = int((await offload(views.catalog_last_modified, request)).timestamp())
+  response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+  return response, etag, last_modified
+
+def finish_conditional(response, etag, last_modified):
+  # Headers @cache_control(no_cache=True) and @condition add to the sync views
+  response.headers.setdefault("ETag", etag)
+  response.headers.setdefault("Last-Modified", http_date(last_modified))
+  patch_cache_control(response, no_cache=True)
+  return response
+
+async def generate_scripts(request):
+  not_modified, etag, last_modified = await conditional_response(request)
+  if not_modified is not None:
+    return finish_conditional(not_modified, etag, last_modified)
+
+  compact, minify = views.script_format(request)
+  version = await offload(record_revision)
+  scripts = await offload(get_cached_scripts, compact, minify)
+  response = JsonResponse(scripts)
+  response["X-Catalog-Version"] = version
+  return finish_conditional(response, etag, last_modified)
+
+async def download_script(request, script):
+  # Same as views.download_script, with the script built chunk by chunk on the pool
+  not_modified, etag, last_modified = await conditional_response(request)
+  if not_modified is not None:
+    return finish_conditional(not_modified, etag, last_modified)
+
+  compact, minify = views.script_format(request)
+
+  if script == "all":
+    version = await offload(record_revision)
+    mappings = await offload(load_script_mappings)
+    response = StreamingHttpResponse(
+      aiter_in_pool(iter_scripts_zip(mappings, compact, minify)), content_type="application/zip"
+    )
+    response["Content-Disposition"] = 'attachment; filename="scripts.zip"'
+    response["X-Catalog-Version"] = version
+    return finish_conditional(response, etag, last_modified)
+
+  if script not in SCRIPT_SOURCES:
+    raise Http404("Unknown script")
+
+  version = await offload(record_revision)
+  mappings = await offload(load_script_mappings)
+  chunks = iter_script_bytes(script, mappings, compact, minify)
+  gzipped = views.ACCEPTS_GZIP_RE.search(request.headers.get("Accept-Encoding", ""))
+  if gzipped:
+    chunks = iter_gzip(chunks)
+
+  response = StreamingHttpResponse(aiter_in_pool(chunks), content_type="application/javascript; charset=utf-8")
+  if gzipped:
+    response["Content-Encoding"] = "gzip"
+  patch_vary_headers(response, ("Accept-Encoding",))
+  response["Content-Disposition"] = f'attachment; filename="{SCRIPT_SOURCES[script][0]}"'
+  response["X-Catalog-Version"] = version
+  return finish_conditional(response, etag, last_modified)
+
+# Uploads copy the file to disk and create the job row, then render home.html:
+# all blocking, so the whole sync view runs on the pool
+async def upload_category_csv(request):
+  return await offload(views.upload_category_csv, request)
+
+async def upload_subcategory_csv(request):
+  return await offload(views.upload_subcategory_csv, request)
+
+# The first report after a catalog change compares every block of names,
+# keep it off the event loop
+async def near_duplicates(request):
+  return await offload(views.near_duplicates, request)
+
+async def near_duplicates_api(request):
+  return await offload(views.near_duplicates_api, request)
+
+async def validate_import(request, kind):
+  # Reading the upload and every row is blocking, both run on the pool
+  if kind not in views.VALIDATORS:
+    raise Http404("Unknown import kind")
+  if request.method != "POST":
+    return JsonResponse({"error": "POST the file to validate."}, status=405)
+
+  chunks = await offload(views.validation_chunks, request, kind)
+  if chunks is None:
+    return JsonResponse({"error": "Please upload a valid CSV or Excel (.xlsx) file."}, status=400)
+  return views.validation_response(aiter_in_pool(chunks), kind)
@@ -0,0 +1,153 @@
+from django.db import connection, transaction
+from .catalog import bump_catalog_version
+from .models import Category, SubCategory, normalize_name
+
+# Rows per executemany()/bulk_create() call where COPY isn't available (PostgreSQL
+# streams the whole load through one COPY)
+LOAD_BATCH_SIZE = 1000
+
+def _table(model):
+  return connection.ops.quote_name(model._meta.db_table)
+
+def bulk_clear(*models):
+  # Empty whole tables without Django's delete collector, which loads every
+  # cascaded row into memory first. models must be listed children first.
+  # A plain DELETE rather than TRUNCATE: TRUNCATE takes an ACCESS EXCLUSIVE
+  # lock held until the import commits, which would block every reader of
+  # the catalog, while DELETE lets them keep reading the old rows.
+  # Returns {model label: deleted count}
+  counts = {}
+  with transaction.atomic():
+    with connection.cursor() as cursor:
+      for model in models:
+        cursor.execute(f"DELETE FROM {_table(model)}")
+        counts[model._meta.label] = cursor.rowcount
+    bump_catalog_version()
+  return counts
+
+def clear_catalog():
+  # Delete every subcategory and category. Returns (categories, subcategories) deleted
+  counts = bulk_clear(SubCategory, Category)
+  return counts[Category._meta.label], counts[SubCategory._meta.label]
+
+def clear_subcategories():
+  # Delete every subcategory. Returns the number deleted
+  return bulk_clear(SubCategory)[SubCategory._meta.label]
+
+def _copy_value(value):
+  # CSV field for COPY: NULL is an unquoted \N, everything else is quoted
+  if value is None:
+    return "\\N"
+  return '"' + str(value).replace('"', '""') + '"'
+
+class _CopyStream:
+  # File-like object that turns rows into CSV lines as COPY reads it,
+  # so the upload is never held in memory as one string
+  def __init__(self, rows):
+    self.lines = (",".join(_copy_value(value) for value in row) + "\n" for row in rows)
+    self.buffer = ""
+
+  def read(self, size=-1):
+    parts = [self.buffer]
+    length = len(self.buffer)
+    for line in self.lines:
+      parts.append(line)
+      length += len(line)
+      if 0 <= size <= length:
+        break
+    data = "".join(parts)
+    if size < 0:
+      self.buffer = ""
+      return data
+    self.buffer = data[size:]
+    return data[:size]
+
+def _copy_load(model, fields, rows):
+  # PostgreSQL: COPY everything into a temp table in one stream, then move it
+  # over in input order so the first of two conflicting rows is the one kept
+  table = _table(model)
+  staging = connection.ops.quote_name(f"load_{model._meta.db_table}")
+  columns = ", ".join(connection.ops.quote_name(model._meta.get_field(f).column) for f in fields)
+  definitions = ", ".join(
+    f"{connection.ops.quote_name(model._meta.get_field(f).column)} {model._meta.get_field(f).db_type(connection)}"
+    for f in fields
+  )
+  copy_sql = f"COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+
+  with connection.cursor() as cursor:
+    # bulk_load runs this in a transaction, a failed load rolls the temp table back too
+    cursor.execute(f"CREATE TEMPORARY TABLE {staging} (load_order bigserial, {definitions}) ON COMMIT DROP")
+    if hasattr(cursor, "copy_expert"):
+      # psycopg2
+      cursor.copy_expert(copy_sql, _CopyStream(rows))
+    else:
+      # psycopg 3
+      with cursor.copy(copy_sql) as copy:
+        stream = _CopyStream(rows)
+        while data := stream.read(64 * 1024):
+          copy.write(data)
+    cursor.execute(
+      f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} "
+      f"ORDER BY load_order ON CONFLICT DO NOTHING"
+    )
+    inserted = cursor.rowcount
+    # Free the name for the next load in the same transaction
+    cursor.execute(f"DROP TABLE {staging}")
+  return inserted
+
+def _executemany_load(model, fields, rows, batch_size):
+  # SQLite: plain parameter tuples, no model instances. INSERT OR IGNORE
+  # skips rows that hit a unique constraint, earlier rows win.
+  columns = ", ".join(connection.ops.quote_name(model._meta.get_field(f).column) for f in fields)
+  placeholders = ", ".join(["%s"] * len(fields))
+  sql = f"INSERT OR IGNORE INTO {_table(model)} ({columns}) VALUES ({placeholders})"
+
+  inserted = 0
+  with connection.cursor() as cursor:
+    for batch in _batches(rows, batch_size):
+      cursor.executemany(sql, batch)
+      inserted += cursor.rowcount
+  return inserted
+
+def _orm_load(model, fields, rows, batch_size):
+  # Any other backend: bulk_create, which can't report what ignore_conflicts skipped
+  attnames = [model._meta.get_field(f).attname for f in fields]
+  before = model.objects.count()
+  for batch in _batches(rows, batch_size):
+    model.objects.bulk_create(
+      [model(**dict(zip(attnames, row))) for row in batch], ignore_conflicts=True
+    )
+  return model.objects.count() - before
+
+def _batches(rows, size):
+  batch = []
+  for row in rows:
+    batch.append(row)
+    if len(batch) >= size:
+      yield batch
+      batch = []
+  if batch:
+    yield batch
+
+def bulk_load(model, fields, rows, batch_size=LOAD_BATCH_SIZE, normalized=False):
+  # Insert rows (tuples of values for fields, a ForeignKey takes the id) into
+  # a catalog table the fastest way the backend offers. Rows that hit a unique
+  # constraint are skipped, first occurrence wins. normalized_name is filled
+  # in from name, like CatalogQuerySet.bulk_create does, unless normalized=True
+  # says each row already ends with it.
+  # Returns the number of rows inserted
+  if not normalized:
+    name_position = fields.index("name")
+    rows = ((*row, normalize_name(row[name_position])) for row in rows)
+  fields = [*fields, "normalized_name"]
+
+  with transaction.atomic():
+    if connection.vendor == "postgresql":
+      # One COPY stream for every row, batch_size doesn't apply
+      inserted = _copy_load(model, fields, rows)
+    elif connection.vendor == "sqlite":
+      inserted = _executemany_load(model, fields, rows, batch_size)
+    else:
+      inserted = _orm_load(model, fields, rows, batch_size)
+    bump_catalog_version()
+  return inserted
@@ -0,0 +1,53 @@
+import time
+from datetime import datetime, timezone
+from django.db import transaction
+from django.db.models import F
+
+# The catalog version lives in one database row (models.CatalogVersion), so
+# every worker sees the same one and concurrent bumps can't be lost. Anything
+# derived from the catalog is cached under it and rebuilt when it moves.
+CATALOG_VERSION_ID = 1
+
+def _init_catalog_version():
+  # Start from the current time in ms so a recreated row never reuses an old version
+  from .models import CatalogVersion
+  now = time.time()
+  row, _ = CatalogVersion.objects.get_or_create(
+    pk=CATALOG_VERSION_ID,
+    defaults={"version": int(now * 1000), "modified": datetime.fromtimestamp(now, tz=timezone.utc)},
+  )
+  return row.version, row.modified
+
+def _read_catalog_version():
+  # (version, last modified), one primary key lookup
+  from .models import CatalogVersion
+  row = CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).values_list("version", "modified").first()
+  if row is None:
+    row = _init_catalog_version()
+  return row
+
+def get_catalog_version():
+  return _read_catalog_version()[0]
+
+def get_catalog_last_modified():
+  return _read_catalog_version()[1]
+
+def _bump():
+  from .models import CatalogVersion
+  # Atomic in the database, two writes committing together bump it twice
+  bumped = CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).update(
+    version=F("version") + 1, modified=datetime.now(tz=timezone.utc)
+  )
+  if not bumped:
+    # Row missing (never initialised): starts at a fresh version anyway
+    _init_catalog_version()
+
+def bump_catalog_version():
+  # Called on every Category/SubCategory write. Bump after commit so nobody
+  # caches pre-commit data under the new version.
+  transaction.on_commit(_bump)
+
+def catalog_cache_key(name, version=None):
+  if version is None:
+    version = get_catalog_version()
+  return f"catalog:{name}:{version}"
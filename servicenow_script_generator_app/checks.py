@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.checks import Warning
+
+# Backends whose values only the current process sees
+PER_PROCESS_CACHES = (
+  "django.core.cache.backends.locmem.LocMemCache",
+  "django.core.cache.backends.dummy.DummyCache",
+)
+
+def check_shared_cache(app_configs, **kwargs):
+  # Import progress (jobs.py) is written to the default cache by the worker
+  # running the import and read by whichever worker serves the status poll.
+  # In a per-process cache the others only see it once the job finishes.
+  if settings.CACHES["default"]["BACKEND"] not in PER_PROCESS_CACHES:
+    return []
+  return [Warning(
+    "The default cache is per process, so workers don't share import progress.",
+    hint="Set CACHE_URL to a shared cache, e.g. dbcache://snow_cache (run manage.py createcachetable) or rediscache://...",
+    id="servicenow_script_generator_app.W001",
+  )]
@@ -0,0 +1,200 @@
+import math
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from django.conf import settings
+from django.core.cache import cache
+from .catalog import catalog_cache_key
+from .snapshot import get_snapshot
+
+# Near-duplicate names ("Network Printer", "Network Printers", "Netwrok Printer")
+# without comparing every pair. Names are split into character trigrams, and
+# only names sharing one of their rarest trigrams become candidates (prefix
+# filtering, so a block costs about its total trigram count instead of n²).
+# Candidates are then scored with difflib. The filters are exact: every pair
+# at or above the threshold is found. Subcategories are only compared with
+# the other subcategories of their category.
+
+# Lowest similarity accepted from ?threshold=, below it nearly every pair is a candidate
+MIN_THRESHOLD = 0.6
+MAX_THRESHOLD = 0.99
+
+# Length of the character n-grams names are blocked on
+NGRAM = 3
+
+# Slack for float rounding in the length bounds
+_EPSILON = 1e-9
+
+def parse_threshold(value):
+  # ?threshold= as a float within the accepted range, settings.DUPLICATE_THRESHOLD otherwise
+  try:
+    threshold = float(value)
+  except (TypeError, ValueError):
+    return settings.DUPLICATE_THRESHOLD
+  return min(max(threshold, MIN_THRESHOLD), MAX_THRESHOLD)
+
+def _comparable(name):
+  # Casing and runs of whitespace don't count as differences
+  return " ".join(name.lower().split())
+
+def _ngrams(text):
+  padded = f" {text} "
+  return {padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1)}
+
+def _length_range(length, threshold):
+  # Lengths a name can have and still reach `threshold` against one of `length`
+  # characters: difflib's ratio is at most 2 * shorter / (both lengths)
+  shortest = math.ceil(length * threshold / (2 - threshold) - _EPSILON)
+  longest = math.floor(length * (2 - threshold) / threshold + _EPSILON)
+  return shortest, longest
+
+def _max_broken(length, other, threshold):
+  # Most n-grams of a `length`-character name that a name of `other` characters
+  # at least `threshold` similar can lack. A ratio of t needs
+  # t * (length + other) / 2 matched characters. Each unmatched character of
+  # the name breaks up to NGRAM of its n-grams, and each unmatched character
+  # of the other name can split NGRAM - 1 more where it sits between matches.
+  matched = min(math.ceil(threshold * (length + other) / 2 - _EPSILON), length, other)
+  return NGRAM * (length - matched) + (NGRAM - 1) * (other - matched)
+
+def _similarity(a, b, threshold):
+  matcher = SequenceMatcher(None, a, b, autojunk=False)
+  # The quick upper bounds reject most candidates without the full match
+  if matcher.real_quick_ratio() < threshold or matcher.quick_ratio() < threshold:
+    return 0.0
+  return matcher.ratio()
+
+def similar_pairs(texts, threshold):
+  # (i, j, similarity) with i < j for every pair of texts whose difflib ratio
+  # (texts[i] against texts[j]) is at or above threshold. Empty texts are skipped.
+  grams = [_ngrams(text) for text in texts]
+  frequency = Counter(gram for text_grams in grams for gram in text_grams)
+  # Same global order for every text, rarest first
+  ordered = [sorted(text_grams, key=lambda gram: (frequency[gram], gram)) for text_grams in grams]
+
+  broken = {}
+  def max_broken(length, lengths):
+    # Worst case over the partner lengths, memoized
+    key = (length, lengths.start, lengths.stop)
+    if key not in broken:
+      broken[key] = max(_max_broken(length, other, threshold) for other in lengths)
+    return broken[key]
+
+  pairs = []
+  index = defaultdict(list)
+  # Names that may share no n-gram with a longer partner, compared directly
+  unindexed = []
+  unindexed_lengths = []
+  # Every name so far, for names that may share none with a shorter partner
+  seen = []
+  seen_lengths = []
+
+  # Shortest first: names already seen are at most as long as the current one
+  for i in sorted((i for i, text in enumerate(texts) if text), key=lambda i: len(texts[i])):
+    length = len(texts[i])
+    shortest, longest = _length_range(length, threshold)
+    size = len(ordered[i])
+
+    # n-grams the current name keeps in common with any shorter partner. Two
+    # names sharing that many share one within the prefixes of both.
+    probe_shared = size - max_broken(length, range(shortest, length + 1))
+    if probe_shared > 0:
+      candidates = set()
+      for gram in ordered[i][:size - probe_shared + 1]:
+        candidates.update(j for j in index.get(gram, ()) if len(texts[j]) >= shortest)
+      candidates.update(unindexed[bisect_left(unindexed_lengths, shortest):])
+    else:
+      candidates = seen[bisect_left(seen_lengths, shortest):]
+
+    for j in candidates:
+      other = len(texts[j])
+      # Counting shared n-grams is a set intersection, far cheaper than difflib
+      need = max(size - _max_broken(length, other, threshold), len(grams[j]) - _max_broken(other, length, threshold))
+      if need > 0 and len(grams[i] & grams[j]) < need:
+        continue
+      a, b = min(i, j), max(i, j)
+      similarity = _similarity(texts[a], texts[b], threshold)
+      if similarity >= threshold:
+        pairs.append((a, b, similarity))
+
+    # Same for longer partners, which are still to come
+    index_shared = size - max_broken(length, range(length, longest + 1))
+    if index_shared > 0:
+      for gram in ordered[i][:size - index_shared + 1]:
+        index[gram].append(i)
+    else:
+      unindexed.append(i)
+      unindexed_lengths.append(length)
+    seen.append(i)
+    seen_lengths.append(length)
+  return pairs
+
+def _group_pairs(count, pairs):
+  # Union-find over the pairs: (positions, pairs) for each connected group
+  parent = list(range(count))
+
+  def find(i):
+    while parent[i] != i:
+      parent[i] = parent[parent[i]]
+      i = parent[i]
+    return i
+
+  for i, j, _ in pairs:
+    parent[find(i)] = find(j)
+
+  groups = {}
+  for pair in pairs:
+    groups.setdefault(find(pair[0]), ([], []))[1].append(pair)
+  for i in range(count):
+    group = groups.get(find(i))
+    if group is not None:
+      group[0].append(i)
+  return groups.values()
+
+def _report_groups(names, ids, pairs, category):
+  # JSON-ready groups for one block of names
+  report = []
+  for positions, group_pairs in _group_pairs(len(names), pairs):
+    group_pairs.sort(key=lambda pair: -pair[2])
+    report.append({
+      "category": category,
+      "members": [{"id": ids[i], "name": names[i]} for i in sorted(positions, key=names.__getitem__)],
+      "pairs": [{"a": ids[i], "b": ids[j], "similarity": round(similarity, 3)} for i, j, similarity in group_pairs],
+      "similarity": round(group_pairs[0][2], 3),
+    })
+  return report
+
+# What can be checked: categories against each other, or subcategories within their category
+DUPLICATE_KINDS = ("subcategory", "category")
+
+def find_duplicates(kind, threshold):
+  # Groups of near-duplicate names, ordered by category then name
+  snapshot = get_snapshot()
+  if kind == "category":
+    names, ids = snapshot.category_names, snapshot.category_ids
+    blocks = [(None, range(len(ids)))]
+  else:
+    names, ids = snapshot.subcategory_names, snapshot.subcategory_ids
+    blocks = (
+      (snapshot.category_names[category], positions)
+      for category, positions in enumerate(snapshot.subcategories_of)
+      if len(positions) > 1
+    )
+
+  groups = []
+  for category, positions in blocks:
+    block_names = [names[p] for p in positions]
+    pairs = similar_pairs([_comparable(name) for name in block_names], threshold)
+    if pairs:
+      groups.extend(_report_groups(block_names, [ids[p] for p in positions], pairs, category))
+  groups.sort(key=lambda group: (group["category"] or "", group["members"][0]["name"]))
+  return groups
+
+def get_duplicates(kind, threshold):
+  # The report only changes with the catalog, so cache it under its version
+  key = catalog_cache_key(f"duplicates:{kind}:{threshold}")
+  groups = cache.get(key)
+  if groups is None:
+    groups = find_duplicates(kind, threshold)
+    cache.set(key, groups)
+  return groups
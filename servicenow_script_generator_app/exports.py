@@ -0,0 +1,59 @@
+import tempfile, openpyxl
+from django.http import FileResponse
+from .snapshot import get_snapshot
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Column headers of the SNOW sys_choice import sheet
+EXCEL_HEADERS = [
+  "Dependent value",
+  "Element",
+  "Hint",
+  "Inactive",
+  "Label",
+  "Language",
+  "Sequence",
+  "Synonyms",
+  "Value",
+]
+
+def category_export_rows():
+  # Read from the shared catalog snapshot, ordered by sequence then name
+  snapshot = get_snapshot()
+  for position in snapshot.categories_in_export_order():
+    name = snapshot.category_names[position]
+    # Dependent value, Element, Hint, Inactive, Label, Language, Sequence, Synonyms, Value
+    yield (None, "category", None, "FALSE", name, None, snapshot.category_sequence(position), None, name)
+
+def subcategory_export_rows():
+  snapshot = get_snapshot()
+  for position in snapshot.subcategories_in_export_order():
+    name = snapshot.subcategory_names[position]
+    # Dependent value is the parent Category
+    category_name = snapshot.category_names[snapshot.subcategory_category[position]]
+    yield (category_name, "subcategory", None, "FALSE", name, None, snapshot.subcategory_sequence(position), None, name)
+
+def write_excel(fileobj, title, rows):
+  # Write-only workbooks flush each row to disk instead of keeping cells in memory
+  wb = openpyxl.Workbook(write_only=True)
+  ws = wb.create_sheet(title)
+  ws.append(EXCEL_HEADERS)
+  for row in rows:
+    ws.append(row)
+  wb.save(fileobj)
+
+def write_excel_tempfile(title, rows):
+  # Build the sheet in a temp file, returned rewound and ready to stream
+  tmp = tempfile.TemporaryFile()
+  try:
+    write_excel(tmp, title, rows)
+  except Exception:
+    tmp.close()
+    raise
+  tmp.seek(0)
+  return tmp
+
+def excel_response(title, filename, rows):
+  # Build the sheet in a temp file and stream it back in chunks
+  tmp = write_excel_tempfile(title, rows)
+  return FileResponse(tmp, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
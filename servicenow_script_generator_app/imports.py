@@ -0,0 +1,475 @@
+import codecs, csv, multiprocessing, openpyxl, os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from django.db import transaction
+from .models import Category, SubCategory
+from .bulk import bulk_load, clear_catalog, clear_subcategories
+from .parsing import (
+  normalize_name, parse_category_row, parse_subcategory_row, csv_chunk_offsets, parse_csv_chunk
+)
+
+# Number of rows sent to the database per INSERT
+BULK_BATCH_SIZE = 1000
+
+# Parallel parsing: smallest chunk handed to a worker process, and chunks per worker
+# (a few each, so one slow chunk doesn't leave the others idle)
+PARSE_MIN_CHUNK_SIZE = 1024 * 1024
+PARSE_CHUNKS_PER_PROCESS = 4
+
+def iter_csv_rows(uploaded_file):
+  # Iterating an UploadedFile yields byte lines chunk by chunk (never the whole file),
+  # decode them incrementally so multi-byte characters split across chunks are safe
+  lines = codecs.iterdecode(uploaded_file, "utf-8-sig")
+  return csv.DictReader(lines)
+
+def _xlsx_header(value):
+  # "Dependent value" (sheet label) -> "dependent_value" (CSV field name)
+  return "_".join(str(value or "").strip().lower().split())
+
+def _xlsx_cell(value):
+  # Give cells the same string form they have in the CSV export
+  if value is None:
+    return ""
+  if isinstance(value, bool):
+    return "true" if value else "false"
+  if isinstance(value, float) and value.is_integer():
+    return str(int(value))
+  return str(value)
+
+def iter_xlsx_rows(fileobj):
+  # Read-only mode streams rows out of the sheet XML instead of loading the
+  # workbook, yields the same dicts as iter_csv_rows
+  wb = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+  try:
+    rows = wb.active.iter_rows(values_only=True)
+    header = [_xlsx_header(value) for value in next(rows, ())]
+    for values in rows:
+      if not any(value is not None for value in values):
+        continue
+      yield {key: _xlsx_cell(value) for key, value in zip(header, values)}
+  finally:
+    wb.close()
+
+# Upload file extensions and the row reader for each
+ROW_READERS = {
+  ".csv": iter_csv_rows,
+  ".xlsx": iter_xlsx_rows,
+}
+
+def iter_category_rows(rows, not_added):
+  # Yield (name, sequence) for every importable category row,
+  # recording skipped rows in not_added
+  for row in rows:
+    value, sequence, inactive = parse_category_row(row)
+
+    # skip inactive rows
+    if inactive:
+      not_added.append(f"{value} (is inactive)")
+      continue
+
+    yield value, sequence
+
+def load_category_ids():
+  # Resolve dependent_value against one in-memory lookup instead of a query per row
+  category_ids = {}
+  for category_id, name in Category.objects.order_by("id").values_list("id", "name").iterator():
+    category_ids.setdefault(name, category_id)
+  return category_ids
+
+def iter_subcategory_rows(rows, category_ids, not_added):
+  # Yield (category_id, name, sequence) for every importable subcategory row,
+  # recording skipped rows in not_added
+  for row in rows:
+    category_name, value, sequence, inactive = parse_subcategory_row(row)
+
+    # Skip invalid rows
+    if inactive:
+      not_added.append(f"{value} (is inactive)")
+      continue
+
+    category_id = category_ids.get(category_name)
+    if category_id is None:
+      not_added.append(missing_category_message(value))
+      continue
+
+    yield category_id, value, sequence
+
+def missing_category_message(value):
+  return f"{value} (category missing or doesn't match what's in Category table)"
+
+# Row statuses in a validation (dry run) report
+ACCEPTED = "accepted"
+DUPLICATE = "duplicate"
+INACTIVE = "inactive"
+MISSING_CATEGORY = "missing_category"
+VALIDATION_STATUSES = (ACCEPTED, DUPLICATE, INACTIVE, MISSING_CATEGORY)
+
+def _with_summary(results):
+  # Pass row results through, then yield {"summary": count per status, "rows": total}.
+  # A file that can't be read ends the report with an "error" before the summary.
+  counts = dict.fromkeys(VALIDATION_STATUSES, 0)
+  try:
+    for result in results:
+      counts[result["status"]] += 1
+      yield result
+  except Exception as e:
+    yield {"error": f"Could not read the file: {e}"}
+  yield {"summary": counts, "rows": sum(counts.values())}
+
+def iter_category_validation(rows):
+  # Dry run of import_categories: one result per row in file order (row 1 is
+  # the first row after the header), then the summary. Writes nothing.
+  def results():
+    first_rows = {}
+    for number, row in enumerate(rows, start=1):
+      name, sequence, inactive = parse_category_row(row)
+      result = {"row": number, "status": ACCEPTED, "name": name, "sequence": sequence}
+      key = normalize_name(name)
+      if inactive:
+        result["status"] = INACTIVE
+      elif key in first_rows:
+        result["status"] = DUPLICATE
+        result["duplicate_of"] = first_rows[key]
+      else:
+        first_rows[key] = number
+      yield result
+
+  return _with_summary(results())
+
+def iter_subcategory_validation(rows):
+  # Dry run of import_subcategories, categories resolve against the current table
+  def results():
+    category_ids = load_category_ids()
+    first_rows = {}
+    for number, row in enumerate(rows, start=1):
+      category_name, name, sequence, inactive = parse_subcategory_row(row)
+      result = {"row": number, "status": ACCEPTED, "category": category_name, "name": name, "sequence": sequence}
+      category_id = category_ids.get(category_name)
+      key = (category_id, normalize_name(name))
+      if inactive:
+        result["status"] = INACTIVE
+      elif category_id is None:
+        result["status"] = MISSING_CATEGORY
+      elif key in first_rows:
+        result["status"] = DUPLICATE
+        result["duplicate_of"] = first_rows[key]
+      else:
+        first_rows[key] = number
+      yield result
+
+  return _with_summary(results())
+
+def import_categories(rows, batch_size=BULK_BATCH_SIZE):
+  # Replace the Category table with the given rows.
+  # Returns (created_count, not_added)
+
+  # Track skipped rows
+  not_added = []
+
+  with transaction.atomic():
+    # Clear old categories (and their subcategories, as the cascade did)
+    clear_catalog()
+
+    # Rows stream straight into the table (COPY on PostgreSQL). The unique
+    # normalized_name constraint drops duplicates, first occurrence wins.
+    created_count = bulk_load(Category, ["name", "sequence"], iter_category_rows(rows, not_added), batch_size)
+
+  return created_count, not_added
+
+def import_subcategories(rows, batch_size=BULK_BATCH_SIZE):
+  # Replace the SubCategory table with the given rows.
+  # Returns (created_count, not_added)
+
+  # Track skipped rows
+  not_added = []
+
+  with transaction.atomic():
+    category_ids = load_category_ids()
+
+    # Clear old subcategories
+    clear_subcategories()
+
+    # Same as categories, duplicates are per (category, normalized name)
+    created_count = bulk_load(
+      SubCategory,
+      ["category", "name", "sequence"],
+      iter_subcategory_rows(rows, category_ids, not_added),
+      batch_size,
+    )
+
+  return created_count, not_added
+
+def iter_parsed_chunks(path, kind, processes, progress=None):
+  # Parse a CSV in line-aligned chunks on a pool of worker processes and
+  # yield each chunk's items in file order (see parsing.parse_csv_chunk).
+  # progress(rows read so far) is called after every chunk.
+  size = os.path.getsize(path)
+  chunk_size = max(size // (processes * PARSE_CHUNKS_PER_PROCESS), PARSE_MIN_CHUNK_SIZE)
+  header, offsets = csv_chunk_offsets(path, chunk_size)
+
+  # spawn: forking a threaded web process isn't safe, workers only import parsing.py
+  context = multiprocessing.get_context("spawn")
+  rows_read = 0
+  pending = deque()
+  offsets = iter(offsets)
+  with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+    while True:
+      # Keep every worker busy, but don't parse far ahead of the database
+      for start, end in islice(offsets, processes * 2 - len(pending)):
+        pending.append(pool.submit(parse_csv_chunk, path, start, end, header, kind))
+      if not pending:
+        return
+      # Chunks are merged in file order, so the outcome is the same as
+      # parsing the file front to back
+      count, items = pending.popleft().result()
+      rows_read += count
+      yield items
+      if progress:
+        progress(rows_read)
+
+def parallel_import_categories(path, processes, progress=None, batch_size=BULK_BATCH_SIZE):
+  # import_categories for a CSV on disk, parsed on `processes` worker processes.
+  # Returns (created_count, not_added)
+  not_added = []
+
+  def accepted():
+    # Chunks already dropped their own repeats, drop the ones across chunks
+    seen = set()
+    for items in iter_parsed_chunks(path, "category", processes, progress):
+      for item in items:
+        if item[0] == "skip":
+          not_added.append(item[1])
+          continue
+        _, key, name, sequence = item
+        if key not in seen:
+          seen.add(key)
+          yield name, sequence, key
+
+  with transaction.atomic():
+    # Clear old categories (and their subcategories, as the cascade did)
+    clear_catalog()
+    created_count = bulk_load(Category, ["name", "sequence"], accepted(), batch_size, normalized=True)
+
+  return created_count, not_added
+
+def parallel_import_subcategories(path, processes, progress=None, batch_size=BULK_BATCH_SIZE):
+  # import_subcategories for a CSV on disk, parsed on `processes` worker processes.
+  # Returns (created_count, not_added)
+  not_added = []
+
+  def accepted(category_ids):
+    seen = set()
+    for items in iter_parsed_chunks(path, "subcategory", processes, progress):
+      for item in items:
+        if item[0] == "skip":
+          not_added.append(item[1])
+          continue
+        _, category_name, key, name, sequence = item
+        category_id = category_ids.get(category_name)
+        if category_id is None:
+          not_added.append(missing_category_message(name))
+          continue
+        if (category_id, key) not in seen:
+          seen.add((category_id, key))
+          yield category_id, name, sequence, key
+
+  with transaction.atomic():
+    category_ids = load_category_ids()
+
+    # Clear old subcategories
+    clear_subcategories()
+
+    created_count = bulk_load(
+      SubCategory, ["category", "name", "sequence"], accepted(category_ids), batch_size, normalized=True
+    )
+
+  return created_count, not_added
+
+def _apply_delta(model, incoming, existing, fields, make, batch_size):
+  # incoming: key -> (name, sequence, category id or None) from the export
+  # existing: key -> (id, name, sequence) currently in the table
+  # Only the differences are written; unchanged rows keep their primary keys.
+  counts = {"created": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+
+  to_update = []
+  for key, (pk, name, sequence) in existing.items():
+    if key not in incoming:
+      continue
+    new_name, new_sequence, _ = incoming[key]
+    if (new_name, new_sequence) == (name, sequence):
+      counts["unchanged"] += 1
+    else:
+      to_update.append(model(id=pk, name=new_name, sequence=new_sequence))
+
+  to_delete = [pk for key, (pk, _, _) in existing.items() if key not in incoming]
+  # make() turns incoming values into a bulk_load row for fields
+  to_create = (make(*values) for key, values in incoming.items() if key not in existing)
+
+  for chunk in _chunks(to_delete, batch_size):
+    counts["deleted"] += len(chunk)
+    model.objects.filter(id__in=chunk).delete()
+
+  if to_update:
+    model.objects.bulk_update(to_update, ["name", "sequence"], batch_size=batch_size)
+    counts["updated"] = len(to_update)
+
+  counts["created"] = bulk_load(model, fields, to_create, batch_size)
+
+  return counts
+
+def delta_import_categories(rows, batch_size=BULK_BATCH_SIZE):
+  # Bring the Category table in line with the export by normalized name:
+  # insert new categories, update changed spelling/sequence, remove missing ones.
+  # Returns (counts, not_added)
+  not_added = []
+
+  incoming = {}
+  for name, sequence in iter_category_rows(rows, not_added):
+    incoming.setdefault(normalize_name(name), (name, sequence, None))
+
+  with transaction.atomic():
+    existing = {
+      key: (pk, name, sequence)
+      for pk, key, name, sequence in
+      Category.objects.values_list("id", "normalized_name", "name", "sequence").iterator()
+    }
+    counts = _apply_delta(
+      Category, incoming, existing, ["name", "sequence"],
+      lambda name, sequence, _: (name, sequence),
+      batch_size,
+    )
+
+  return counts, not_added
+
+def delta_import_subcategories(rows, batch_size=BULK_BATCH_SIZE):
+  # Same as delta_import_categories, keyed by (category, normalized name)
+  # Returns (counts, not_added)
+  not_added = []
+
+  with transaction.atomic():
+    category_ids = load_category_ids()
+
+    incoming = {}
+    for category_id, name, sequence in iter_subcategory_rows(rows, category_ids, not_added):
+      incoming.setdefault((category_id, normalize_name(name)), (name, sequence, category_id))
+
+    existing = {
+      (category_id, key): (pk, name, sequence)
+      for pk, category_id, key, name, sequence in
+      SubCategory.objects.values_list("id", "category_id", "normalized_name", "name", "sequence").iterator()
+    }
+    counts = _apply_delta(
+      SubCategory, incoming, existing, ["category", "name", "sequence"],
+      lambda name, sequence, category_id: (category_id, name, sequence),
+      batch_size,
+    )
+
+  return counts, not_added
+
+def _chunks(items, size):
+  for start in range(0, len(items), size):
+    yield items[start:start + size]
+
+def clean_combos(combos):
+  # Validate the add_cat_subcat payload and strip names.
+  # Returns [(category_name, [subcategory names])]
+  if not isinstance(combos, list):
+    raise ValueError("Expected a list of combos.")
+
+  cleaned = []
+  for combo in combos:
+    if not isinstance(combo, dict) or not isinstance(combo.get("subcategories", []), list):
+      raise ValueError("Each combo needs a category and a list of subcategories.")
+    category_name = str(combo.get("category", "")).strip()
+    subcategories = [
+      str(s).strip() for s in combo.get("subcategories", []) if str(s).strip()
+    ]
+    cleaned.append((category_name, subcategories))
+  return cleaned
+
+def add_combos(combos, batch_size=BULK_BATCH_SIZE):
+  # Add category/subcategory combos in one transaction, skipping names that
+  # already exist. Existing rows are looked up per batch of names (never the
+  # whole table) and new ones go in with bulk_create.
+  # Returns per-combo and total created/skipped counts.
+  cleaned = clean_combos(combos)
+
+  with transaction.atomic():
+    # Categories: first spelling in the payload wins
+    wanted_categories = {}
+    for category_name, _ in cleaned:
+      wanted_categories.setdefault(normalize_name(category_name), category_name)
+
+    category_ids = {}
+    for chunk in _chunks(list(wanted_categories), batch_size):
+      category_ids.update(
+        Category.objects.filter(normalized_name__in=chunk).values_list("normalized_name", "id")
+      )
+
+    new_category_keys = [key for key in wanted_categories if key not in category_ids]
+    Category.objects.bulk_create(
+      [Category(name=wanted_categories[key], sequence=None) for key in new_category_keys],
+      batch_size=batch_size,
+      ignore_conflicts=True,
+    )
+    # ignore_conflicts doesn't return ids, read them back
+    for chunk in _chunks(new_category_keys, batch_size):
+      category_ids.update(
+        Category.objects.filter(normalized_name__in=chunk).values_list("normalized_name", "id")
+      )
+
+    # Subcategories: unique per (category, normalized name)
+    wanted_pairs = {}
+    for category_name, subcategories in cleaned:
+      category_id = category_ids[normalize_name(category_name)]
+      for sub_name in subcategories:
+        wanted_pairs.setdefault((category_id, normalize_name(sub_name)), sub_name)
+
+    existing_pairs = set()
+    for chunk in _chunks(list(wanted_pairs), batch_size):
+      candidates = SubCategory.objects.filter(
+        category_id__in={category_id for category_id, _ in chunk},
+        normalized_name__in={key for _, key in chunk},
+      ).values_list("category_id", "normalized_name")
+      existing_pairs.update(pair for pair in candidates if pair in wanted_pairs)
+
+    SubCategory.objects.bulk_create(
+      [
+        SubCategory(category_id=category_id, name=sub_name, sequence=None)
+        for (category_id, key), sub_name in wanted_pairs.items()
+        if (category_id, key) not in existing_pairs
+      ],
+      batch_size=batch_size,
+      ignore_conflicts=True,
+    )
+
+  # Credit each created row to the first combo that asked for it
+  new_categories = set(new_category_keys)
+  claimed = set()
+  results = []
+  for category_name, subcategories in cleaned:
+    category_key = normalize_name(category_name)
+    category_created = category_key in new_categories and category_key not in claimed
+    claimed.add(category_key)
+
+    created = 0
+    for sub_name in subcategories:
+      pair = (category_ids[category_key], normalize_name(sub_name))
+      if pair not in existing_pairs and pair not in claimed:
+        created += 1
+      claimed.add(pair)
+
+    results.append({
+      "category": category_name,
+      "category_created": category_created,
+      "subcategories_created": created,
+      "subcategories_skipped": len(subcategories) - created,
+    })
+
+  return {
+    "combos": results,
+    "categories_created": len(new_category_keys),
+    "subcategories_created": sum(result["subcategories_created"] for result in results),
+    "subcategories_skipped": sum(result["subcategories_skipped"] for result in results),
+  }
@@ -0,0 +1,262 @@
+import logging, os, threading, time, uuid
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import ImportJob
+from .imports import (
+  ROW_READERS, import_categories, import_subcategories, delta_import_categories, delta_import_subcategories,
+  parallel_import_categories, parallel_import_subcategories,
+)
+
+logger = logging.getLogger(__name__)
+
+# Rows between two progress updates
+PROGRESS_EVERY = 500
+
+# Local pool, no broker: jobs run in this process next to the web worker
+_executor = ThreadPoolExecutor(max_workers=settings.IMPORT_WORKERS, thread_name_prefix="import")
+
+# Seconds between two heartbeats of the jobs this process holds, well within
+# IMPORT_JOB_STALE_SECONDS
+HEARTBEAT_EVERY = 30
+
+# Ids of the queued and running jobs of this process. Lost with it on a
+# restart, which is how the others notice: their heartbeat stops.
+_owned = set()
+_owned_lock = threading.Lock()
+_heartbeat = None
+
+INTERRUPTED_MESSAGE = "❌ Import interrupted: the server restarted before it finished. Upload the file again."
+
+def _progress_key(job_id):
+  return f"import_job:{job_id}:rows"
+
+def save_upload(uploaded_file):
+  # Copy the upload to IMPORT_UPLOAD_DIR chunk by chunk, returns the path
+  os.makedirs(settings.IMPORT_UPLOAD_DIR, exist_ok=True)
+  extension = os.path.splitext(uploaded_file.name)[1].lower()
+  path = os.path.join(settings.IMPORT_UPLOAD_DIR, f"{uuid.uuid4().hex}{extension}")
+  with open(path, "wb") as destination:
+    for chunk in uploaded_file.chunks():
+      destination.write(chunk)
+  return path
+
+# (kind, mode) -> import function
+IMPORTERS = {
+  (ImportJob.CATEGORY, ImportJob.REPLACE): import_categories,
+  (ImportJob.SUBCATEGORY, ImportJob.REPLACE): import_subcategories,
+  (ImportJob.CATEGORY, ImportJob.DELTA): delta_import_categories,
+  (ImportJob.SUBCATEGORY, ImportJob.DELTA): delta_import_subcategories,
+}
+
+# kind -> import function that parses a CSV on disk with a process pool (replace mode)
+PARALLEL_IMPORTERS = {
+  ImportJob.CATEGORY: parallel_import_categories,
+  ImportJob.SUBCATEGORY: parallel_import_subcategories,
+}
+
+def parses_in_parallel(job):
+  return (
+    job.mode == ImportJob.REPLACE
+    and settings.IMPORT_PARSE_PROCESSES > 1
+    and job.file_path.endswith(".csv")
+    and os.path.getsize(job.file_path) >= settings.IMPORT_PARALLEL_MIN_BYTES
+  )
+
+def _send_heartbeats():
+  while True:
+    time.sleep(HEARTBEAT_EVERY)
+    with _owned_lock:
+      owned = list(_owned)
+    try:
+      if owned:
+        ImportJob.objects.filter(pk__in=owned).update(heartbeat_at=timezone.now())
+    except Exception:
+      logger.exception("Import job heartbeat failed")
+    finally:
+      close_old_connections()
+
+def _hold(job_id):
+  # Keep job_id's heartbeat going from this process until _release
+  global _heartbeat
+  with _owned_lock:
+    _owned.add(job_id)
+    if _heartbeat is None:
+      _heartbeat = threading.Thread(target=_send_heartbeats, name="import-heartbeat", daemon=True)
+      _heartbeat.start()
+
+def _release(job_id):
+  with _owned_lock:
+    _owned.discard(job_id)
+
+def _remove_upload(path):
+  if os.path.exists(path):
+    os.remove(path)
+
+def fail_stale_jobs(jobs=None):
+  # Mark queued/running jobs whose process stopped sending heartbeats as failed
+  # and delete their uploads. Returns the ids marked.
+  cutoff = timezone.now() - timedelta(seconds=settings.IMPORT_JOB_STALE_SECONDS)
+  if jobs is None:
+    jobs = ImportJob.objects.all()
+  # Jobs from before heartbeats were recorded go by their creation time
+  silent = Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, created_at__lt=cutoff)
+  unfinished = Q(status__in=[ImportJob.QUEUED, ImportJob.RUNNING])
+  failed = []
+  for pk, file_path in jobs.filter(unfinished, silent).values_list("pk", "file_path"):
+    # Conditional, so a job that just sent a heartbeat or finished is left alone
+    marked = ImportJob.objects.filter(unfinished, silent, pk=pk).update(
+      status=ImportJob.FAILED, message=INTERRUPTED_MESSAGE, finished_at=timezone.now()
+    )
+    if marked:
+      logger.warning("Import job %s was interrupted, marked failed", pk)
+      _remove_upload(file_path)
+      cache.delete(_progress_key(pk))
+      failed.append(pk)
+  return failed
+
+def enqueue_import(kind, uploaded_file, mode=ImportJob.REPLACE):
+  # Save the file and start importing it in the background. Also the moment
+  # to clean up after jobs an earlier process didn't live to finish.
+  fail_stale_jobs()
+  job = ImportJob.objects.create(
+    kind=kind,
+    mode=mode,
+    file_name=uploaded_file.name,
+    file_path=save_upload(uploaded_file),
+    heartbeat_at=timezone.now(),
+  )
+
+  def submit():
+    # Only hand the job to the pool once its row is visible to other connections
+    _hold(job.pk)
+    _executor.submit(run_import_job, job.pk)
+  transaction.on_commit(submit)
+  return job
+
+def _set_progress(job_id, count):
+  # The import runs in one transaction, so progress goes to the cache rather than the job row
+  cache.set(_progress_key(job_id), count, timeout=3600)
+
+def _count_rows(rows, job_id):
+  # Pass rows through, publishing how many have been read
+  count = 0
+  for row in rows:
+    yield row
+    count += 1
+    if count % PROGRESS_EVERY == 0:
+      _set_progress(job_id, count)
+  _set_progress(job_id, count)
+
+# Skipped rows named in a job message, "Validate only" lists every one
+SKIPPED_SHOWN = 50
+
+def skipped_list(not_added):
+  shown = ", ".join(not_added[:SKIPPED_SHOWN])
+  if len(not_added) > SKIPPED_SHOWN:
+    shown += f" and {len(not_added) - SKIPPED_SHOWN} more (validate the file for the full list)"
+  return shown
+
+def upload_message(kind, success_count, not_added):
+  if kind == ImportJob.CATEGORY:
+    # Build upload message to match subcategory style
+    if not_added:
+      return (
+        f"✅ Uploaded {success_count} categories.\n"
+        f"⚠️ Skipped {len(not_added)} categories:\n"
+        + skipped_list(not_added)
+      )
+    return f"✅ Successfully uploaded all {success_count} categories from file."
+
+  if not_added:
+    return (
+      f"✅ Uploaded {success_count} subcategories.\n"
+      f"⚠️ Skipped {len(not_added)} subcategories:\n"
+      + skipped_list(not_added)
+    )
+  return f"✅ Successfully uploaded all {success_count} unique subcategories from file."
+
+def delta_message(kind, counts, not_added):
+  label = "categories" if kind == ImportJob.CATEGORY else "subcategories"
+  message = (
+    f"✅ Delta import of {label}: {counts['created']} added, {counts['updated']} updated, "
+    f"{counts['deleted']} removed, {counts['unchanged']} unchanged."
+  )
+  if not_added:
+    message += f"\n⚠️ Skipped {len(not_added)} {label}:\n" + skipped_list(not_added)
+  return message
+
+def run_import_job(job_id):
+  # Only a job still queued: one that waited past IMPORT_JOB_STALE_SECONDS may
+  # have been marked failed meanwhile, and its upload is gone
+  now = timezone.now()
+  started = ImportJob.objects.filter(pk=job_id, status=ImportJob.QUEUED).update(
+    status=ImportJob.RUNNING, started_at=now, heartbeat_at=now
+  )
+  if not started:
+    _release(job_id)
+    connections.close_all()
+    return
+  job = ImportJob.objects.get(pk=job_id)
+
+  try:
+    if parses_in_parallel(job):
+      result, not_added = PARALLEL_IMPORTERS[job.kind](
+        job.file_path, settings.IMPORT_PARSE_PROCESSES, lambda count: _set_progress(job.pk, count)
+      )
+    else:
+      importer = IMPORTERS[(job.kind, job.mode)]
+      read_rows = ROW_READERS[os.path.splitext(job.file_path)[1]]
+      with open(job.file_path, "rb") as f:
+        result, not_added = importer(_count_rows(read_rows(f), job.pk))
+  except Exception as e:
+    logger.exception("Import job %s failed", job.pk)
+    job.status = ImportJob.FAILED
+    job.message = f"❌ Import failed: {e}"
+  else:
+    job.status = ImportJob.DONE
+    job.skipped_count = len(not_added)
+    if job.mode == ImportJob.DELTA:
+      job.created_count = result["created"]
+      job.updated_count = result["updated"]
+      job.deleted_count = result["deleted"]
+      job.message = delta_message(job.kind, result, not_added)
+    else:
+      job.created_count = result
+      job.message = upload_message(job.kind, result, not_added)
+  finally:
+    job.rows_processed = cache.get(_progress_key(job.pk), 0)
+    job.finished_at = timezone.now()
+    job.save()
+    cache.delete(_progress_key(job.pk))
+    _remove_upload(job.file_path)
+    _release(job.pk)
+    # Connections are per thread, don't leave this one open in the pool
+    connections.close_all()
+
+def job_status(job):
+  # JSON-ready progress of a job. One whose process died is reported failed.
+  if job.status in (ImportJob.QUEUED, ImportJob.RUNNING) and fail_stale_jobs(ImportJob.objects.filter(pk=job.pk)):
+    job.refresh_from_db()
+  rows_processed = job.rows_processed
+  if job.status == ImportJob.RUNNING:
+    rows_processed = cache.get(_progress_key(job.pk), 0)
+
+  return {
+    "id": job.pk,
+    "kind": job.kind,
+    "mode": job.mode,
+    "status": job.status,
+    "file_name": job.file_name,
+    "rows_processed": rows_processed,
+    "created_count": job.created_count,
+    "updated_count": job.updated_count,
+    "deleted_count": job.deleted_count,
+    "skipped_count": job.skipped_count,
+    "message": job.message,
+    "finished": job.status in (ImportJob.DONE, ImportJob.FAILED),
+  }
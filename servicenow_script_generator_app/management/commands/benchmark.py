@@ -0,0 +1,189 @@
+import json, os, random, tempfile, time, tracemalloc
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+  CaptureQueriesContext, override_settings, setup_databases, teardown_databases,
+  setup_test_environment, teardown_test_environment,
+)
+from servicenow_script_generator_app.imports import iter_csv_rows, import_categories, import_subcategories
+
+# Stages slower than this are never reported as regressions (timer noise)
+MIN_SECONDS_SLACK = 0.05
+
+def write_category_csv(path, count, rng):
+  with open(path, "w", newline="", encoding="utf-8") as f:
+    f.write("value,inactive,sequence\n")
+    for i in range(count):
+      # ~1% inactive rows, like a real sys_choice export
+      inactive = "true" if rng.random() < 0.01 else "false"
+      f.write(f"Category {i},{inactive},{i}\n")
+
+def write_subcategory_csv(path, categories, fanout, rng):
+  with open(path, "w", newline="", encoding="utf-8") as f:
+    f.write("value,inactive,dependent_value,sequence\n")
+    for i in range(categories):
+      for j in range(fanout):
+        inactive = "true" if rng.random() < 0.01 else "false"
+        f.write(f"Subcategory {i}-{j},{inactive},Category {i},{j}\n")
+
+def synthetic_combos(categories, count, rng):
+  # Half the combos hit existing categories, half add new ones
+  combos = []
+  for i in range(count):
+    category = f"Category {rng.randrange(categories)}" if i % 2 else f"New Category {i}"
+    combos.append({
+      "category": category,
+      "subcategories": [f"Pasted {i}-{j}" for j in range(5)],
+    })
+  return combos
+
+class Command(BaseCommand):
+  help = (
+    "Time the hot paths (uploads, add_cat_subcat, view, Excel exports, scripts) "
+    "against synthetic catalogs in a throwaway test database and report JSON."
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument(
+      "--scale", type=int, action="append", dest="scales",
+      help="Number of categories to generate (repeatable, default 1000)",
+    )
+    parser.add_argument("--fanout", type=int, default=10, help="Subcategories per category")
+    parser.add_argument("--combos", type=int, default=500, help="Combos posted to add_cat_subcat")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+      "--memory", action="store_true",
+      help="Also record peak Python memory per stage (tracemalloc slows every stage down)",
+    )
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="Baseline JSON report to compare against")
+    parser.add_argument(
+      "--save-baseline", action="store_true",
+      help="Write this run to --baseline instead of comparing",
+    )
+    parser.add_argument(
+      "--tolerance", type=float, default=0.25,
+      help="Allowed slowdown/growth over the baseline (0.25 = 25%%)",
+    )
+
+  def handle(self, *args, **options):
+    scales = options["scales"] or [1000]
+
+    # Never touch the real database or cache
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+      with override_settings(CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "benchmark"},
+      }):
+        report = {
+          "fanout": options["fanout"],
+          "combos": options["combos"],
+          "memory": options["memory"],
+          "scales": {
+            str(scale): self.run_scale(
+              scale, options["fanout"], options["combos"], options["seed"], options["memory"]
+            )
+            for scale in scales
+          },
+        }
+    finally:
+      teardown_databases(old_config, verbosity=0)
+      teardown_test_environment()
+
+    output = json.dumps(report, indent=2)
+    self.stdout.write(output)
+    if options["output"]:
+      with open(options["output"], "w") as f:
+        f.write(output)
+
+    if options["baseline"]:
+      if options["save_baseline"]:
+        with open(options["baseline"], "w") as f:
+          f.write(output)
+        self.stderr.write(f"Saved baseline to {options['baseline']}")
+      else:
+        self.compare(report, options["baseline"], options["tolerance"])
+
+  def measure(self, fn, memory):
+    # Wall time, ORM query count and (optionally) peak Python memory of one stage
+    if memory:
+      tracemalloc.start()
+    with CaptureQueriesContext(connection) as queries:
+      start = time.perf_counter()
+      fn()
+      seconds = time.perf_counter() - start
+    result = {"seconds": round(seconds, 4), "queries": len(queries)}
+    if memory:
+      result["peak_memory_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+      tracemalloc.stop()
+    return result
+
+  def run_scale(self, categories, fanout, combos, seed, memory):
+    rng = random.Random(seed)
+    client = Client()
+
+    def consume(response):
+      # Streaming responses only do their work when read
+      if response.streaming:
+        b"".join(response.streaming_content)
+      if response.status_code >= 400:
+        raise CommandError(f"{response.status_code} from {response.request['PATH_INFO']}")
+
+    def upload(importer, path):
+      # Same work as the background import job, run inline
+      with open(path, "rb") as f:
+        importer(iter_csv_rows(f))
+
+    with tempfile.TemporaryDirectory() as tmp:
+      category_csv = os.path.join(tmp, "categories.csv")
+      subcategory_csv = os.path.join(tmp, "subcategories.csv")
+      write_category_csv(category_csv, categories, rng)
+      write_subcategory_csv(subcategory_csv, categories, fanout, rng)
+      combo_payload = json.dumps(synthetic_combos(categories, combos, rng))
+
+      stages = [
+        ("upload_category_csv", lambda: upload(import_categories, category_csv)),
+        ("upload_subcategory_csv", lambda: upload(import_subcategories, subcategory_csv)),
+        ("add_cat_subcat", lambda: consume(client.post("/add_cat_subcat/", {"all_combos": combo_payload}))),
+        ("view_cat_subcat", lambda: consume(client.get("/view/"))),
+        ("view_cat_subcat_search", lambda: consume(client.get("/view/?subcategory_search=7-1"))),
+        ("generate_category_excel", lambda: consume(client.get("/generate_category_excel/"))),
+        ("generate_subcategory_excel", lambda: consume(client.get("/generate_subcategory_excel/"))),
+        ("generate_scripts", lambda: consume(client.get("/generate_scripts/"))),
+        ("generate_scripts_cached", lambda: consume(client.get("/generate_scripts/"))),
+      ]
+
+      results = {}
+      for name, fn in stages:
+        results[name] = self.measure(fn, memory)
+        self.stderr.write(f"[{categories}] {name}: {results[name]['seconds']}s")
+    return results
+
+  def compare(self, report, baseline_path, tolerance):
+    with open(baseline_path) as f:
+      baseline = json.load(f)
+
+    if baseline.get("memory") != report["memory"]:
+      # tracemalloc changes timings, only compare like with like
+      raise CommandError("Baseline and this run differ in --memory, rerun with the same flags.")
+
+    regressions = []
+    for scale, stages in report["scales"].items():
+      for name, result in stages.items():
+        expected = baseline.get("scales", {}).get(scale, {}).get(name)
+        if not expected:
+          continue
+        if result["seconds"] > expected["seconds"] * (1 + tolerance) + MIN_SECONDS_SLACK:
+          regressions.append(f"{scale}/{name}: {result['seconds']}s vs {expected['seconds']}s")
+        if result["queries"] > expected["queries"] * (1 + tolerance):
+          regressions.append(f"{scale}/{name}: {result['queries']} queries vs {expected['queries']}")
+        if "peak_memory_kb" in result and result["peak_memory_kb"] > expected["peak_memory_kb"] * (1 + tolerance) + 1024:
+          regressions.append(
+            f"{scale}/{name}: {result['peak_memory_kb']} KB peak vs {expected['peak_memory_kb']} KB"
+          )
+
+    if regressions:
+      raise CommandError("Performance regressions against baseline:\n" + "\n".join(regressions))
+    self.stderr.write(self.style.SUCCESS("No regressions against baseline."))
@@ -0,0 +1,211 @@
+import threading, time
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.template.backends.django import DjangoTemplates
+
+# Per-process request metrics, rendered in the Prometheus text format by the
+# metrics view. Each worker process reports its own numbers.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+BYTES_BUCKETS = (1024, 10240, 102400, 1048576, 10485760, 104857600)
+
+_lock = threading.Lock()
+# Stats of the request being served. A context variable rather than a thread
+# local, so async views and the work they hand to threads report here too.
+_current = ContextVar("request_metrics", default=None)
+
+def _escape(value):
+  return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels, extra=()):
+  pairs = [*labels, *extra]
+  if not pairs:
+    return ""
+  return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+class Counter:
+  def __init__(self, name, help_text):
+    self.name = name
+    self.help_text = help_text
+    self.series = {}
+
+  def inc(self, labels, amount=1):
+    with _lock:
+      self.series[labels] = self.series.get(labels, 0) + amount
+
+  def render(self):
+    lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+    for labels, value in sorted(self.series.items()):
+      lines.append(f"{self.name}{_format_labels(labels)} {value}")
+    return lines
+
+class Histogram:
+  def __init__(self, name, help_text, buckets):
+    self.name = name
+    self.help_text = help_text
+    self.buckets = buckets
+    # labels -> [cumulative bucket counts..., sum, count]
+    self.series = {}
+
+  def observe(self, labels, value):
+    with _lock:
+      series = self.series.get(labels)
+      if series is None:
+        series = self.series[labels] = [0] * (len(self.buckets) + 2)
+      for i, bound in enumerate(self.buckets):
+        if value <= bound:
+          series[i] += 1
+      series[-2] += value
+      series[-1] += 1
+
+  def render(self):
+    lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+    for labels, series in sorted(self.series.items()):
+      for bound, count in zip(self.buckets, series):
+        lines.append(f"{self.name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+      lines.append(f"{self.name}_bucket{_format_labels(labels, [('le', '+Inf')])} {series[-1]}")
+      lines.append(f"{self.name}_sum{_format_labels(labels)} {series[-2]}")
+      lines.append(f"{self.name}_count{_format_labels(labels)} {series[-1]}")
+    return lines
+
+REQUESTS = Counter("snow_http_requests_total", "Requests by view, method and status.")
+LATENCY = Histogram("snow_http_request_duration_seconds", "Time spent producing the response.", LATENCY_BUCKETS)
+QUERIES = Histogram("snow_http_request_db_queries", "ORM queries per request.", QUERY_BUCKETS)
+SQL_TIME = Histogram("snow_http_request_db_seconds", "Time spent in SQL per request.", LATENCY_BUCKETS)
+TEMPLATE_TIME = Histogram("snow_http_request_template_seconds", "Template render time per request.", LATENCY_BUCKETS)
+RESPONSE_BYTES = Histogram("snow_http_response_bytes", "Response body size.", BYTES_BUCKETS)
+
+METRICS = [REQUESTS, LATENCY, QUERIES, SQL_TIME, TEMPLATE_TIME, RESPONSE_BYTES]
+
+def render_metrics():
+  lines = []
+  for metric in METRICS:
+    lines.extend(metric.render())
+  return "\n".join(lines) + "\n"
+
+class _RequestStats:
+  def __init__(self):
+    self.queries = 0
+    self.sql_seconds = 0.0
+    self.template_seconds = 0.0
+
+def _record_query(execute, sql, params, many, context):
+  # connection.execute_wrapper hook on every connection, whichever thread
+  # runs the query: sync views, the threads async views hand work to, or
+  # the thread Django runs sync views on under ASGI
+  stats = _current.get()
+  if stats is None:
+    return execute(sql, params, many, context)
+  start = time.perf_counter()
+  try:
+    return execute(sql, params, many, context)
+  finally:
+    stats.sql_seconds += time.perf_counter() - start
+    stats.queries += 1
+
+def install_query_hook(sender, connection, **kwargs):
+  # connection_created receiver (see apps.py). First in the list, so
+  # execute_wrapper() blocks open while the connection is made still pop their own
+  if _record_query not in connection.execute_wrappers:
+    connection.execute_wrappers.insert(0, _record_query)
+
+class TimedTemplate:
+  # Wraps a backend template to add its render time to the current request
+  def __init__(self, template):
+    self.template = template
+
+  def __getattr__(self, name):
+    return getattr(self.template, name)
+
+  def render(self, context=None, request=None):
+    start = time.perf_counter()
+    try:
+      return self.template.render(context, request)
+    finally:
+      stats = _current.get()
+      if stats is not None:
+        stats.template_seconds += time.perf_counter() - start
+
+class TimedDjangoTemplates(DjangoTemplates):
+  # Django template backend that reports render time to RequestMetricsMiddleware
+  def from_string(self, template_code):
+    return TimedTemplate(super().from_string(template_code))
+
+  def get_template(self, template_name):
+    return TimedTemplate(super().get_template(template_name))
+
+def _count_streamed_bytes(content, labels):
+  size = 0
+  try:
+    for chunk in content:
+      size += len(chunk)
+      yield chunk
+  finally:
+    RESPONSE_BYTES.observe(labels, size)
+
+async def _acount_streamed_bytes(content, labels):
+  size = 0
+  try:
+    async for chunk in content:
+      size += len(chunk)
+      yield chunk
+  finally:
+    RESPONSE_BYTES.observe(labels, size)
+
+class RequestMetricsMiddleware:
+  # Records latency, ORM queries/SQL time, template time and response size per view.
+  # For streamed responses latency and queries stop at the headers, bytes at the last chunk.
+  # Sync and async capable like Django's own middleware, so under ASGI async
+  # views aren't pushed onto a thread just to be measured.
+  sync_capable = True
+  async_capable = True
+
+  def __init__(self, get_response):
+    self.get_response = get_response
+    if iscoroutinefunction(get_response):
+      markcoroutinefunction(self)
+
+  def __call__(self, request):
+    if iscoroutinefunction(self):
+      return self.__acall__(request)
+    stats = _RequestStats()
+    token = _current.set(stats)
+    start = time.perf_counter()
+    try:
+      response = self.get_response(request)
+    finally:
+      _current.reset(token)
+    return self.record(request, response, stats, time.perf_counter() - start)
+
+  async def __acall__(self, request):
+    stats = _RequestStats()
+    token = _current.set(stats)
+    start = time.perf_counter()
+    try:
+      response = await self.get_response(request)
+    finally:
+      _current.reset(token)
+    return self.record(request, response, stats, time.perf_counter() - start)
+
+  def record(self, request, response, stats, elapsed):
+    match = request.resolver_match
+    view = (match.url_name or match.view_name) if match else "unmatched"
+    labels = (("view", view),)
+
+    REQUESTS.inc((("view", view), ("method", request.method), ("status", response.status_code)))
+    LATENCY.observe(labels, elapsed)
+    QUERIES.observe(labels, stats.queries)
+    SQL_TIME.observe(labels, stats.sql_seconds)
+    TEMPLATE_TIME.observe(labels, stats.template_seconds)
+
+    if not response.streaming:
+      RESPONSE_BYTES.observe(labels, len(response.content))
+    elif response.has_header("Content-Length"):
+      RESPONSE_BYTES.observe(labels, int(response["Content-Length"]))
+    else:
+      # Size is only known once the body has been sent
+      count = _acount_streamed_bytes if response.is_async else _count_streamed_bytes
+      response.streaming_content = count(response.streaming_content, labels)
+
+    return response
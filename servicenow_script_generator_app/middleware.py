@@ -0,0 +1,29 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+  # WhiteNoise is sync only, and one sync middleware turns the whole chain
+  # below it sync, so under ASGI every async view would run on a thread.
+  # Static files are found and opened on a thread, everything else is passed
+  # on to the async chain.
+  sync_capable = True
+  async_capable = True
+
+  def __init__(self, get_response=None, *args, **kwargs):
+    super().__init__(get_response, *args, **kwargs)
+    if iscoroutinefunction(get_response):
+      markcoroutinefunction(self)
+
+  def __call__(self, request):
+    if iscoroutinefunction(self):
+      return self.__acall__(request)
+    return super().__call__(request)
+
+  async def __acall__(self, request):
+    if self.autorefresh:
+      static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+    else:
+      static_file = self.files.get(request.path_info)
+    if static_file is not None:
+      return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+    return await self.get_response(request)
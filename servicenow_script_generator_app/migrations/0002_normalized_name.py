@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicenow_script_generator_app', '0001_initial'),
+    ]
+
+    operations = [
+        # Empty for now, 0003 fills it in before 0004 makes it unique
+        migrations.AddField(
+            model_name='category',
+            name='normalized_name',
+            field=models.CharField(default='', editable=False, max_length=100),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='subcategory',
+            name='normalized_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+            preserve_default=False,
+        ),
+    ]
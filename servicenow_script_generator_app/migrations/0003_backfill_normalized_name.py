@@ -0,0 +1,74 @@
+from collections import defaultdict
+from django.db import migrations
+from servicenow_script_generator_app.parsing import normalize_name
+
+BATCH_SIZE = 1000
+
+
+def backfill(model):
+    # Fill in normalized_name for every row, in batches
+    batch = []
+    for row in model.objects.only('id', 'name').order_by('id').iterator(chunk_size=BATCH_SIZE):
+        row.normalized_name = normalize_name(row.name)
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            model.objects.bulk_update(batch, ['normalized_name'])
+            batch = []
+    if batch:
+        model.objects.bulk_update(batch, ['normalized_name'])
+
+
+def duplicate_ids(rows):
+    # rows: (id, key) ordered by id. Returns {kept id: [ids of its later duplicates]}
+    first = {}
+    duplicates = defaultdict(list)
+    for pk, key in rows:
+        if key in first:
+            duplicates[first[key]].append(pk)
+        else:
+            first[key] = pk
+    return duplicates
+
+
+def normalize_and_merge(apps, schema_editor):
+    # Before 0004 adds the unique constraints: fill in normalized_name, then
+    # merge names that only differed in casing or spacing. The oldest row
+    # (lowest id) is kept, like the importers keep the first occurrence.
+    Category = apps.get_model('servicenow_script_generator_app', 'Category')
+    SubCategory = apps.get_model('servicenow_script_generator_app', 'SubCategory')
+    backfill(Category)
+    backfill(SubCategory)
+
+    # A duplicate category's subcategories move to the category kept
+    merged_categories = 0
+    category_rows = Category.objects.order_by('id').values_list('id', 'normalized_name')
+    for kept, duplicates in duplicate_ids(category_rows.iterator()).items():
+        SubCategory.objects.filter(category_id__in=duplicates).update(category_id=kept)
+        Category.objects.filter(id__in=duplicates).delete()
+        merged_categories += len(duplicates)
+
+    # Which can leave, or already had, the same subcategory twice in a category
+    removed_subcategories = 0
+    subcategory_rows = SubCategory.objects.order_by('id').values_list('id', 'category_id', 'normalized_name')
+    for duplicates in duplicate_ids((pk, (category, name)) for pk, category, name in subcategory_rows.iterator()).values():
+        SubCategory.objects.filter(id__in=duplicates).delete()
+        removed_subcategories += len(duplicates)
+
+    if merged_categories or removed_subcategories:
+        # Shown in the migrate output
+        print(
+            f'\n  Merged {merged_categories} duplicate categories and removed '
+            f'{removed_subcategories} duplicate subcategories'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicenow_script_generator_app', '0002_normalized_name'),
+    ]
+
+    operations = [
+        # Merged rows can't be split again; migrating back leaves them merged
+        migrations.RunPython(normalize_and_merge, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicenow_script_generator_app', '0003_backfill_normalized_name'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='category',
+            constraint=models.UniqueConstraint(fields=('normalized_name',), name='unique_category_normalized_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='subcategory',
+            constraint=models.UniqueConstraint(fields=('category', 'normalized_name'), name='unique_subcategory_normalized_name'),
+        ),
+    ]
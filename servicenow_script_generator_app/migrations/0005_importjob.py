@@ -0,0 +1,35 @@
+# Generated by Django 4.2.24 on 2026-10-18 07:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicenow_script_generator_app', '0004_normalized_name_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('category', 'Category'), ('subcategory', 'Subcategory')], max_length=20)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('file_name', models.CharField(max_length=255)),
+                ('file_path', models.CharField(max_length=500)),
+                ('rows_processed', models.IntegerField(default=0)),
+                ('created_count', models.IntegerField(default=0)),
+                ('skipped_count', models.IntegerField(default=0)),
+                ('message', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Import job',
+                'verbose_name_plural': 'Import jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
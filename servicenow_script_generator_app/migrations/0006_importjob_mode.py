@@ -0,0 +1,28 @@
+# Generated by Django 4.2.24 on 2026-10-18 07:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicenow_script_generator_app', '0005_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='deleted_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='mode',
+            field=models.CharField(choices=[('replace', 'Replace'), ('delta', 'Delta')], default='replace', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='updated_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -1,24 +1,167 @@
 from django.db import models
+from .catalog import bump_catalog_version
+# Lives with the Django-free row parsing, re-exported for the rest of the app
+from .parsing import normalize_name
 
-class Category(models.Model):
+class CatalogQuerySet(models.QuerySet):
+  # Bulk writes skip save()/delete(), so keep normalized_name in sync and
+  # bump the catalog version here too
+  def bulk_create(self, objs, *args, **kwargs):
+    objs = list(objs)
+    for obj in objs:
+      obj.normalized_name = normalize_name(obj.name)
+    created = super().bulk_create(objs, *args, **kwargs)
+    bump_catalog_version()
+    return created
+
+  def bulk_update(self, objs, fields, *args, **kwargs):
+    objs = list(objs)
+    if "name" in fields:
+      for obj in objs:
+        obj.normalized_name = normalize_name(obj.name)
+      fields = [*fields, "normalized_name"]
+    updated = super().bulk_update(objs, fields, *args, **kwargs)
+    bump_catalog_version()
+    return updated
+
+  def update(self, **kwargs):
+    if isinstance(kwargs.get("name"), str):
+      kwargs["normalized_name"] = normalize_name(kwargs["name"])
+    updated = super().update(**kwargs)
+    bump_catalog_version()
+    return updated
+
+  def delete(self):
+    deleted = super().delete()
+    bump_catalog_version()
+    return deleted
+
+class CatalogModel(models.Model):
+  objects = CatalogQuerySet.as_manager()
+
+  class Meta:
+    abstract = True
+
+  def save(self, *args, **kwargs):
+    self.normalized_name = normalize_name(self.name)
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and "name" in update_fields:
+      kwargs["update_fields"] = {*update_fields, "normalized_name"}
+    super().save(*args, **kwargs)
+    bump_catalog_version()
+
+  def delete(self, *args, **kwargs):
+    deleted = super().delete(*args, **kwargs)
+    bump_catalog_version()
+    return deleted
+
+class Category(CatalogModel):
   name = models.CharField(max_length=100)
+  # normalize_name(name), kept in sync on every write; duplicates are rejected by the database
+  normalized_name = models.CharField(max_length=100, editable=False)
   sequence = models.IntegerField(null=True, blank=True)
 
   class Meta:
     verbose_name = "Category"
     verbose_name_plural = "Categories"
+    constraints = [
+      models.UniqueConstraint(fields=["normalized_name"], name="unique_category_normalized_name"),
+    ]
 
   def __str__(self):
     return self.name
 
-class SubCategory(models.Model):
+class SubCategory(CatalogModel):
   category = models.ForeignKey(Category, related_name='subcategories', on_delete=models.CASCADE)
   name = models.CharField(max_length=100)
+  normalized_name = models.CharField(max_length=100, editable=False, db_index=True)
   sequence = models.IntegerField(null=True, blank=True)
 
   class Meta:
     verbose_name = "Subcategory"
     verbose_name_plural = "Subcategories"
+    constraints = [
+      models.UniqueConstraint(fields=["category", "normalized_name"], name="unique_subcategory_normalized_name"),
+    ]
 
   def __str__(self):
     return f"{self.category.name} - {self.name}"
+
+class ImportJob(models.Model):
+  # A CSV upload being imported in the background (see jobs.py)
+  CATEGORY = "category"
+  SUBCATEGORY = "subcategory"
+  KIND_CHOICES = [
+    (CATEGORY, "Category"),
+    (SUBCATEGORY, "Subcategory"),
+  ]
+
+  QUEUED = "queued"
+  RUNNING = "running"
+  DONE = "done"
+  FAILED = "failed"
+  STATUS_CHOICES = [
+    (QUEUED, "Queued"),
+    (RUNNING, "Running"),
+    (DONE, "Done"),
+    (FAILED, "Failed"),
+  ]
+
+  # replace: delete the table and insert the export
+  # delta: only apply inserts/updates/removals that differ from the table
+  REPLACE = "replace"
+  DELTA = "delta"
+  MODE_CHOICES = [
+    (REPLACE, "Replace"),
+    (DELTA, "Delta"),
+  ]
+
+  kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+  mode = models.CharField(max_length=20, choices=MODE_CHOICES, default=REPLACE)
+  status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+  file_name = models.CharField(max_length=255)
+  file_path = models.CharField(max_length=500)
+  rows_processed = models.IntegerField(default=0)
+  created_count = models.IntegerField(default=0)
+  updated_count = models.IntegerField(default=0)
+  deleted_count = models.IntegerField(default=0)
+  skipped_count = models.IntegerField(default=0)
+  message = models.TextField(blank=True)
+  created_at = models.DateTimeField(auto_now_add=True)
+  started_at = models.DateTimeField(null=True, blank=True)
+  finished_at = models.DateTimeField(null=True, blank=True)
+  # Touched while the process that owns the job is alive, a queued or running
+  # job it stops touching was lost with that process (see jobs.py)
+  heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+  class Meta:
+    verbose_name = "Import job"
+    verbose_name_plural = "Import jobs"
+    ordering = ["-created_at"]
+
+  def __str__(self):
+    return f"{self.get_kind_display()} import {self.pk} ({self.status})"
+
+class ScriptRevision(models.Model):
+  # Fingerprints of the switch cases in the scripts served at one catalog
+  # version, so patches.py can tell a client what changed since (see patches.py)
+  version = models.BigIntegerField(unique=True)
+  # {script name: {"all": hash of the all-options list, "cases": {case: hash of its options}}}
+  fingerprints = models.JSONField()
+  created_at = models.DateTimeField(auto_now_add=True)
+
+  class Meta:
+    ordering = ["-created_at"]
+
+  def __str__(self):
+    return f"Scripts at catalog version {self.version}"
+
+class CatalogVersion(models.Model):
+  # The one row holding the catalog version every worker shares (see catalog.py).
+  # Bumped with an UPDATE ... SET version = version + 1, so concurrent writes
+  # each move it on.
+  version = models.BigIntegerField()
+  modified = models.DateTimeField()
+
+  def __str__(self):
+    return f"Catalog version {self.version}"
@@ -0,0 +1,75 @@
+from bisect import bisect_left, bisect_right
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+DEFAULT_PAGE_SIZE = 50
+PAGE_SIZE_CHOICES = [25, 50, 100, 250]
+
+# Below this many rows an exact COUNT(*) is cheap enough
+ESTIMATED_COUNT_THRESHOLD = 100000
+
+def get_page_size(request):
+  try:
+    page_size = int(request.GET.get("page_size", DEFAULT_PAGE_SIZE))
+  except ValueError:
+    return DEFAULT_PAGE_SIZE
+  return page_size if page_size in PAGE_SIZE_CHOICES else DEFAULT_PAGE_SIZE
+
+def _get_id(request, param):
+  value = request.GET.get(param, "")
+  return int(value) if value.isdigit() else None
+
+def keyset_page_from_ids(request, ids, load_rows, prefix, page_size):
+  # Keyset (seek) pagination over an already sorted list of ids (a search
+  # result from search.py or the ids of the catalog snapshot): a page is found
+  # by bisecting for the cursor id, so page 1000 costs the same as page 1
+  # (unlike OFFSET), and load_rows(page ids) only builds the page itself
+  after = _get_id(request, f"{prefix}_after")
+  before = _get_id(request, f"{prefix}_before")
+
+  if before is not None:
+    end = bisect_left(ids, before)
+    start = max(end - page_size, 0)
+  else:
+    start = bisect_right(ids, after) if after is not None else 0
+    end = start + page_size
+
+  page_ids = ids[start:end]
+  rows = load_rows(page_ids)
+
+  return {
+    "rows": rows,
+    "prev_url": _page_url(request, prefix, "before", page_ids[0]) if start > 0 and page_ids else None,
+    "next_url": _page_url(request, prefix, "after", page_ids[-1]) if end < len(ids) and page_ids else None,
+  }
+
+def _page_url(request, prefix, direction, pk):
+  # Keep every other filter/page param, only move this table's cursor
+  params = request.GET.copy()
+  params.pop(f"{prefix}_after", None)
+  params.pop(f"{prefix}_before", None)
+  params[f"{prefix}_{direction}"] = pk
+  return f"?{params.urlencode()}"
+
+class EstimatedCountPaginator(Paginator):
+  # COUNT(*) over a whole big table is a full scan on PostgreSQL. For unfiltered
+  # querysets use the planner's row estimate instead (kept fresh by autovacuum),
+  # filtered ones and other backends still get the exact count.
+  @cached_property
+  def count(self):
+    queryset = self.object_list
+    if isinstance(queryset, QuerySet) and not queryset.query.where:
+      connection = connections[queryset.db]
+      if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+          cursor.execute(
+            "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+            [connection.ops.quote_name(queryset.model._meta.db_table)],
+          )
+          row = cursor.fetchone()
+        # reltuples is -1 for a table that was never analyzed
+        if row and row[0] >= ESTIMATED_COUNT_THRESHOLD:
+          return int(row[0])
+    return super().count
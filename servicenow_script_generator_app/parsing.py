@@ -0,0 +1,80 @@
+import csv, io
+
+# Row parsing shared by the importers and the parse worker processes.
+# Nothing here may import Django: spawned workers import this module
+# without setting Django up.
+
+# Helper function to normalize names
+def normalize_name(name):
+  #Normalize names for comparison (remove casing and spacing)
+  if not name:
+      return ""
+  return "".join(name.lower().split())
+
+def parse_sequence(sequence_raw):
+  sequence_raw = (sequence_raw or "").strip()
+  return int(sequence_raw) if sequence_raw.isdigit() else None
+
+def parse_category_row(row):
+  # Returns (name, sequence, inactive)
+  value = (row.get("value") or "").strip()
+  inactive = (row.get("inactive") or "").lower()
+  return value, parse_sequence(row.get("sequence")), inactive == "true"
+
+def parse_subcategory_row(row):
+  # Returns (category name, name, sequence, inactive)
+  value = (row.get("value") or "").strip()
+  inactive = (row.get("inactive") or "").strip().lower()
+  category_name = (row.get("dependent_value") or "").strip()
+  # Anything but an explicit "false" counts as inactive
+  return category_name, value, parse_sequence(row.get("sequence")), inactive != "false"
+
+def csv_chunk_offsets(path, chunk_size):
+  # Split a CSV file into byte ranges that start and end on line boundaries.
+  # Returns (header fields, [(start, end), ...]). Assumes no quoted field
+  # spans lines, which holds for SNOW sys_choice exports.
+  with open(path, "rb") as f:
+    header = next(csv.reader([f.readline().decode("utf-8-sig")]), [])
+    offsets = []
+    start = f.tell()
+    size = f.seek(0, io.SEEK_END)
+    while start < size:
+      f.seek(min(start + chunk_size, size))
+      f.readline()
+      end = f.tell()
+      offsets.append((start, end))
+      start = end
+  return header, offsets
+
+def parse_csv_chunk(path, start, end, header, kind):
+  # Runs in a worker process. Parses and normalizes one line-aligned chunk.
+  # Returns (rows read, items): in file order, ("skip", message) for inactive rows and
+  #   category:    ("row", normalized name, name, sequence), repeats dropped
+  #   subcategory: ("row", category name, normalized name, name, sequence)
+  # Subcategory repeats are dropped after the parent resolves categories,
+  # rows with a missing category are reported there.
+  with open(path, "rb") as f:
+    f.seek(start)
+    data = f.read(end - start).decode("utf-8")
+
+  count = 0
+  items = []
+  seen = set()
+  for row in csv.DictReader(io.StringIO(data), fieldnames=header):
+    count += 1
+    if kind == "category":
+      name, sequence, inactive = parse_category_row(row)
+      if inactive:
+        items.append(("skip", f"{name} (is inactive)"))
+        continue
+      key = normalize_name(name)
+      if key not in seen:
+        seen.add(key)
+        items.append(("row", key, name, sequence))
+    else:
+      category_name, name, sequence, inactive = parse_subcategory_row(row)
+      if inactive:
+        items.append(("skip", f"{name} (is inactive)"))
+        continue
+      items.append(("row", category_name, normalize_name(name), name, sequence))
+  return count, items
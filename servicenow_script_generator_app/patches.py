@@ -0,0 +1,118 @@
+import hashlib, json, threading
+from django.core.cache import cache
+from django.db import transaction
+from .catalog import get_catalog_version, catalog_cache_key
+from .models import ScriptRevision
+from .scripts import load_script_mappings, iter_switch_case_lines, SCRIPT_SOURCES
+
+# Incremental script updates: every catalog version a script is served at is
+# recorded with a fingerprint per switch case, so a client holding the scripts
+# of an older version can fetch just the cases that changed since.
+
+# Revisions kept, a client further behind downloads the full scripts again
+REVISIONS_KEPT = 20
+
+# Script name -> the element its cases add options to
+CASE_ELEMENTS = {
+  "category_based_on_subcat": "category",
+  "subcat_based_on_category": "subcategory",
+}
+
+def _fingerprint(options):
+  return hashlib.blake2b(json.dumps(options).encode("utf-8"), digest_size=8).hexdigest()
+
+def script_fingerprints(mappings):
+  # {script name: {"all": hash of the all-options list, "cases": {case: hash of its options}}}
+  fingerprints = {}
+  for name, (_, _, mapping_key, options_key) in SCRIPT_SOURCES.items():
+    fingerprints[name] = {
+      "all": _fingerprint(mappings[options_key]),
+      "cases": {key: _fingerprint(options) for key, options in mappings[mapping_key].items() if key != ''},
+    }
+  return fingerprints
+
+_state = None
+_recorded_version = None
+_lock = threading.Lock()
+
+def current_state():
+  # (version, mappings, fingerprints) for the current catalog. Built once per
+  # version, a request while it is current only reads the version.
+  global _state
+  version = get_catalog_version()
+  cached = _state
+  if cached and cached[0] == version:
+    return cached
+
+  with _lock:
+    cached = _state
+    if cached and cached[0] == version:
+      return cached
+    mappings = load_script_mappings()
+    _state = (mappings["version"], mappings, script_fingerprints(mappings))
+    return _state
+
+def record_revision():
+  # Called whenever scripts are served. Returns the catalog version they are at
+  global _recorded_version
+  # Recorded already: no mappings to build, only the version read
+  version = get_catalog_version()
+  if version == _recorded_version:
+    return version
+
+  version, _, fingerprints = current_state()
+  with transaction.atomic():
+    ScriptRevision.objects.get_or_create(version=version, defaults={"fingerprints": fingerprints})
+    stale = list(ScriptRevision.objects.values_list("id", flat=True)[REVISIONS_KEPT:])
+    if stale:
+      ScriptRevision.objects.filter(id__in=stale).delete()
+  _recorded_version = version
+  return version
+
+def build_script_patch(since):
+  # Cases added, changed and removed since catalog version `since`, or None
+  # when that version was never served or has been pruned
+  revision = ScriptRevision.objects.filter(version=since).first()
+  if revision is None:
+    return None
+
+  version, mappings, fingerprints = current_state()
+  scripts = {}
+  for name, (_, _, mapping_key, options_key) in SCRIPT_SOURCES.items():
+    old = revision.fingerprints[name]
+    new = fingerprints[name]
+    mapping = mappings[mapping_key]
+    added = []
+    changed = []
+    for key, fingerprint in new["cases"].items():
+      previous = old["cases"].get(key)
+      if previous == fingerprint:
+        continue
+      entry = {
+        "key": key,
+        "options": mapping[key],
+        "case": "\n".join(iter_switch_case_lines(key, mapping[key], CASE_ELEMENTS[name])),
+      }
+      (added if previous is None else changed).append(entry)
+
+    patch = {
+      "added": added,
+      "changed": changed,
+      "removed": [key for key in old["cases"] if key not in new["cases"]],
+    }
+    # Only sent when it differs, it is as long as the catalog
+    if old["all"] != new["all"]:
+      patch["all_options"] = mappings[options_key]
+    scripts[name] = patch
+
+  return {"since": since, "version": version, "scripts": scripts}
+
+def get_script_patch(since):
+  # Patches only change when the catalog does, so cache them under its version
+  key = catalog_cache_key(f"script_patch:{since}")
+  patch = cache.get(key)
+  if patch is None:
+    patch = build_script_patch(since)
+    if patch is not None:
+      cache.set(key, patch)
+  return patch
@@ -0,0 +1,274 @@
+import json, zipfile, zlib
+from collections import defaultdict
+from django.core.cache import cache
+from .catalog import catalog_cache_key
+from .snapshot import get_snapshot
+
+def iter_switch_case_lines(key, options, element):
+  # One case of a switch script (also sent on its own by patches.py)
+  yield f'    case "{key}":'
+  yield f"      addOptions({element}, {json.dumps([''] + options)});"
+  yield "      break;"
+  yield ""
+
+def iter_category_based_on_subcat_lines(category_based_on_subcat, all_categories, compact=False, minify=False):
+  if compact:
+    yield from iter_lookup_script_lines(
+      category_based_on_subcat, all_categories, "allCategories", "subcategory", "category", minify
+    )
+    return
+
+  yield "function onChange(isLoading) {"
+  yield "    if (isLoading) {"
+  yield "        return;"
+  yield "    }"
+  yield ""
+
+  # Dump allCategories as JSON (safe for JS)
+  yield f"  var allCategories = {json.dumps(all_categories)};"
+  yield ""
+  yield "  var subCat = g_form.getValue('subcategory');"
+  yield "  var category = g_form.getControl('category');"
+  yield ""
+  yield "  g_form.clearOptions('category');"
+  yield ""
+  yield "  switch (subCat) {"
+  yield '    case "":'
+  yield "      addOptions(category, allCategories);"
+  yield "      break;"
+  yield ""
+
+  # Loop through mappings to create cases
+  for sub, cats in category_based_on_subcat.items():
+    if sub == '':
+      continue
+    yield from iter_switch_case_lines(sub, cats, "category")
+
+  yield "  }"
+  yield ""
+  yield "  function addOptions(element, options) {"
+  yield "    options.forEach(function(option) {"
+  yield "      var label = option === '' ? '-- None --' : option;"
+  yield "      g_form.addOption('category', option, label);"
+  yield "    });"
+  yield "  }"
+  yield "}"
+
+def iter_subcategory_based_on_category_lines(subcat_based_on_category, all_subcategories, compact=False, minify=False):
+  if compact:
+    yield from iter_lookup_script_lines(
+      subcat_based_on_category, all_subcategories, "allSubCategories", "category", "subcategory", minify
+    )
+    return
+
+  yield "function onChange(isLoading) {"
+  yield "    if (isLoading) {"
+  yield "        return;"
+  yield "    }"
+  yield ""
+
+  # Dump allCategories as JSON (safe for JS)
+  yield f"  var allSubCategories = {json.dumps(all_subcategories)};"
+  yield ""
+  yield "  var category = g_form.getValue('category');"
+  yield "  var subCat = g_form.getControl('subcategory');"
+  yield ""
+  yield "  g_form.clearOptions('subcategory');"
+  yield ""
+  yield "  switch (category) {"
+  yield '    case "":'
+  yield "      addOptions(subCat, allSubCategories);"
+  yield "      break;"
+  yield ""
+
+  # Loop through mappings to create cases
+  for cat, subs in subcat_based_on_category.items():
+    if cat == '':
+      continue
+    yield from iter_switch_case_lines(cat, subs, "subcategory")
+
+  yield "  }"
+  yield ""
+  yield "  function addOptions(element, options) {"
+  yield "    options.forEach(function(option) {"
+  yield "      var label = option === '' ? '-- None --' : option;"
+  yield "      g_form.addOption('subcategory', option, label);"
+  yield "    });"
+  yield "  }"
+  yield "}"
+
+def iter_lookup_script_lines(mapping, all_options, all_var, source_field, target_field, minify=False):
+  # Compact alternative to the switch scripts: one lookup object pointing at
+  # de-duplicated option arrays, so identical option lists are only emitted once
+  separators = (",", ":") if minify else (", ", ": ")
+  option_lists = []
+  interned = {}
+  lookup = {}
+
+  for key, options in mapping.items():
+    if key == '':
+      continue
+    options = tuple([''] + options)
+    index = interned.get(options)
+    if index is None:
+      index = interned[options] = len(option_lists)
+      option_lists.append(options)
+    lookup[key] = index
+
+  yield "function onChange(isLoading) {"
+  yield "    if (isLoading) {"
+  yield "        return;"
+  yield "    }"
+  yield ""
+  yield f"  var {all_var} = {json.dumps(all_options, separators=separators)};"
+  yield f"  var optionLists = {json.dumps(option_lists, separators=separators)};"
+  yield f"  var lookup = {json.dumps(lookup, separators=separators)};"
+  yield ""
+  yield f"  var value = g_form.getValue('{source_field}');"
+  yield ""
+  yield f"  g_form.clearOptions('{target_field}');"
+  yield ""
+  yield "  var options = [];"
+  yield "  if (value === '') {"
+  yield f"    options = {all_var};"
+  yield "  } else if (Object.prototype.hasOwnProperty.call(lookup, value)) {"
+  yield "    options = optionLists[lookup[value]];"
+  yield "  }"
+  yield ""
+  yield "  options.forEach(function(option) {"
+  yield "    var label = option === '' ? '-- None --' : option;"
+  yield f"    g_form.addOption('{target_field}', option, label);"
+  yield "  });"
+  yield "}"
+
+def join_script_lines(lines, minify=False):
+  # Every statement ends in ; { or }, so dropping indentation and newlines is safe
+  if minify:
+    return "".join(line.strip() for line in lines)
+  return "\n".join(lines)
+
+def build_category_based_on_subcat_string(category_based_on_subcat, all_categories, compact=False, minify=False):
+  return join_script_lines(
+    iter_category_based_on_subcat_lines(category_based_on_subcat, all_categories, compact, minify), minify
+  )
+
+def build_subcategory_based_on_category_string(subcat_based_on_category, all_subcategories, compact=False, minify=False):
+  return join_script_lines(
+    iter_subcategory_based_on_category_lines(subcat_based_on_category, all_subcategories, compact, minify), minify
+  )
+
+def load_script_mappings():
+  # Built from the shared catalog snapshot, only the version is read while it is current
+  snapshot = get_snapshot()
+
+  # List of all categories and subcategories 
+  all_categories = [''] + snapshot.category_names
+  all_subcategories = [''] + snapshot.subcategory_names
+  
+  # Create defaultdict to hold category/subcategory mappings
+  subcat_based_on_category = defaultdict(list)
+  category_based_on_subcat = defaultdict(list)
+
+  # Map subcategories to their categories and vice versa
+  for name, category in zip(snapshot.subcategory_names, snapshot.subcategory_category):
+    category_name = snapshot.category_names[category]
+    subcat_based_on_category[category_name].append(name)
+    category_based_on_subcat[name].append(category_name)
+
+  return {
+    "version": snapshot.version,
+    "all_categories": all_categories,
+    "all_subcategories": all_subcategories,
+    "category_based_on_subcat": category_based_on_subcat,
+    "subcat_based_on_category": subcat_based_on_category,
+  }
+
+def build_scripts(compact=False, minify=False):
+  mappings = load_script_mappings()
+
+  # Build JS strings
+  return {
+    "category_based_on_subcat_script": build_category_based_on_subcat_string(
+      mappings["category_based_on_subcat"], mappings["all_categories"], compact, minify
+    ),
+    "subcat_based_on_category_script": build_subcategory_based_on_category_string(
+      mappings["subcat_based_on_category"], mappings["all_subcategories"], compact, minify
+    ),
+  }
+
+def get_cached_scripts(compact=False, minify=False):
+  # Scripts only change when the catalog does, so cache them under its version
+  key = catalog_cache_key(f"scripts:{int(compact)}{int(minify)}")
+  scripts = cache.get(key)
+  if scripts is None:
+    scripts = build_scripts(compact, minify)
+    cache.set(key, scripts)
+  return scripts
+
+# Scripts that can be downloaded: name -> (filename, line generator, mapping key, all options key)
+SCRIPT_SOURCES = {
+  "category_based_on_subcat": (
+    "category_based_on_subcat.js", iter_category_based_on_subcat_lines, "category_based_on_subcat", "all_categories"
+  ),
+  "subcat_based_on_category": (
+    "subcat_based_on_category.js", iter_subcategory_based_on_category_lines, "subcat_based_on_category", "all_subcategories"
+  ),
+}
+
+# Bytes collected before handing a chunk to the response
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def iter_script_bytes(name, mappings, compact=False, minify=False):
+  # Encode the script line by line, grouped into STREAM_CHUNK_SIZE chunks
+  filename, iter_lines, mapping_key, options_key = SCRIPT_SOURCES[name]
+  chunk = []
+  size = 0
+  for line in iter_lines(mappings[mapping_key], mappings[options_key], compact, minify):
+    data = (line.strip() if minify else line + "\n").encode("utf-8")
+    chunk.append(data)
+    size += len(data)
+    if size >= STREAM_CHUNK_SIZE:
+      yield b"".join(chunk)
+      chunk = []
+      size = 0
+  if chunk:
+    yield b"".join(chunk)
+
+def iter_gzip(chunks):
+  # gzip on the fly (wbits=31 writes a gzip header instead of a raw zlib one)
+  compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+  for chunk in chunks:
+    data = compressor.compress(chunk)
+    if data:
+      yield data
+  yield compressor.flush()
+
+class _ZipStream:
+  # Write-only sink for ZipFile, drained by the generator after every write.
+  # No tell()/seek(), so ZipFile writes data descriptors instead of seeking back.
+  def __init__(self):
+    self.parts = []
+
+  def write(self, data):
+    self.parts.append(bytes(data))
+    return len(data)
+
+  def flush(self):
+    pass
+
+  def drain(self):
+    data = b"".join(self.parts)
+    self.parts = []
+    return data
+
+def iter_scripts_zip(mappings, compact=False, minify=False):
+  stream = _ZipStream()
+  with zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED) as zf:
+    for name, (filename, *_) in SCRIPT_SOURCES.items():
+      with zf.open(filename, "w") as entry:
+        for chunk in iter_script_bytes(name, mappings, compact, minify):
+          entry.write(chunk)
+          data = stream.drain()
+          if data:
+            yield data
+  yield stream.drain()
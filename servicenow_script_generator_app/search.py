@@ -0,0 +1,156 @@
+import heapq, threading
+from array import array
+from bisect import bisect_left
+from .catalog import get_catalog_version
+from .snapshot import get_snapshot
+
+# Length of the n-grams in the index
+NGRAM = 3
+
+def _ngrams(text):
+  return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+class NgramIndex:
+  # In-process substring index over names: every trigram maps to the sorted
+  # positions of the names containing it, so a lookup intersects a few posting
+  # lists instead of scanning the table with LIKE '%x%'
+  def __init__(self, entries):
+    # entries: (id, name, category id, category name), ordered by id.
+    # The category fields are None for the category index.
+    self.ids = array("q")
+    self.names = []
+    self.lowered = []
+    self.category_names = []
+    self.by_category = {}
+    postings = {}
+
+    for position, (pk, name, category_id, category_name) in enumerate(entries):
+      lowered = name.lower()
+      self.ids.append(pk)
+      self.names.append(name)
+      self.lowered.append(lowered)
+      self.category_names.append(category_name)
+      if category_id is not None:
+        self.by_category.setdefault(category_id, array("I")).append(position)
+      for gram in _ngrams(lowered):
+        posting = postings.get(gram)
+        if posting is None:
+          posting = postings[gram] = array("I")
+        posting.append(position)
+
+    self.postings = postings
+
+    # Positions sorted by lowercased name, for prefix lookups
+    self.sorted_positions = sorted(range(len(self.lowered)), key=self.lowered.__getitem__)
+    self.sorted_names = [self.lowered[p] for p in self.sorted_positions]
+
+  def _candidates(self, query):
+    # Positions (ascending) whose name contains query
+    if len(query) < NGRAM:
+      return [p for p, name in enumerate(self.lowered) if query in name]
+
+    postings = []
+    for gram in _ngrams(query):
+      posting = self.postings.get(gram)
+      if posting is None:
+        return []
+      postings.append(posting)
+
+    # Intersect starting from the rarest gram, then confirm the full substring
+    postings.sort(key=len)
+    matches = set(postings[0])
+    for posting in postings[1:]:
+      matches.intersection_update(posting)
+      if not matches:
+        return []
+    return sorted(p for p in matches if query in self.lowered[p])
+
+  def _prefix_positions(self, query, limit):
+    start = bisect_left(self.sorted_names, query)
+    positions = []
+    for i in range(start, min(start + limit, len(self.sorted_names))):
+      if not self.sorted_names[i].startswith(query):
+        break
+      positions.append(self.sorted_positions[i])
+    return positions
+
+  def search_ids(self, query):
+    # Every matching id in id order (same matches as name__icontains)
+    query = query.strip().lower()
+    return [self.ids[p] for p in self._candidates(query)]
+
+  def ids_in_categories(self, category_ids):
+    # Every id whose category is in category_ids, in id order
+    positions = []
+    for category_id in category_ids:
+      positions.extend(self.by_category.get(category_id, ()))
+    positions.sort()
+    return [self.ids[p] for p in positions]
+
+  def rank(self, query, limit=10):
+    # Best matches first: exact, prefix, word prefix, then any substring,
+    # alphabetical within each group
+    query = query.strip().lower()
+    if not query:
+      return []
+
+    def score(position):
+      name = self.lowered[position]
+      if name == query:
+        kind = 0
+      elif name.startswith(query):
+        kind = 1
+      elif f" {query}" in name:
+        kind = 2
+      else:
+        kind = 3
+      return (kind, name)
+
+    # The first `limit` prefix matches in name order are already the best
+    # results, only fall back to a substring scan when there are fewer
+    positions = self._prefix_positions(query, limit)
+    if len(positions) < limit:
+      positions = self._candidates(query)
+    best = heapq.nsmallest(limit, positions, key=score)
+
+    return [
+      {"id": self.ids[p], "name": self.names[p], "category": self.category_names[p]}
+      for p in best
+    ]
+
+_indexes = {}
+_lock = threading.Lock()
+
+def _load_entries(kind):
+  # From the shared catalog snapshot, already in id order
+  snapshot = get_snapshot()
+  if kind == "category":
+    return ((pk, name, None, None) for pk, name in zip(snapshot.category_ids, snapshot.category_names))
+  return (
+    (pk, name, snapshot.category_ids[category], snapshot.category_names[category])
+    for pk, name, category in zip(snapshot.subcategory_ids, snapshot.subcategory_names, snapshot.subcategory_category)
+  )
+
+def get_index(kind):
+  # kind is "category" or "subcategory"; rebuilt lazily when the catalog version moves
+  version = get_catalog_version()
+  cached = _indexes.get(kind)
+  if cached and cached[0] == version:
+    return cached[1]
+
+  with _lock:
+    cached = _indexes.get(kind)
+    if cached and cached[0] == version:
+      return cached[1]
+    index = NgramIndex(_load_entries(kind))
+    _indexes[kind] = (version, index)
+    return index
+
+def search_category_ids(query):
+  return get_index("category").search_ids(query)
+
+def search_subcategory_ids(query, search_by="subcategory"):
+  if search_by == "category":
+    # Subcategories whose parent category matches
+    return get_index("subcategory").ids_in_categories(search_category_ids(query))
+  return get_index("subcategory").search_ids(query)
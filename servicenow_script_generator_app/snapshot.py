@@ -0,0 +1,156 @@
+import sys, threading
+from array import array
+from .catalog import get_catalog_version
+from .models import Category, SubCategory
+
+# Rows fetched per round trip while loading a snapshot
+SNAPSHOT_CHUNK_SIZE = 5000
+
+# Stored in the sequence arrays for a NULL sequence
+NO_SEQUENCE = -2 ** 63
+
+class CategoryRow:
+  # What templates read from a Category, built only for the rows on a page
+  __slots__ = ("id", "name", "sequence")
+
+  def __init__(self, pk, name, sequence):
+    self.id = pk
+    self.name = name
+    self.sequence = sequence
+
+class SubCategoryRow:
+  __slots__ = ("id", "name", "sequence", "category")
+
+  def __init__(self, pk, name, sequence, category):
+    self.id = pk
+    self.name = name
+    self.sequence = sequence
+    self.category = category
+
+def _sequence(value):
+  return NO_SEQUENCE if value is None else value
+
+def _sequence_key(value):
+  # NULL sequences sort last, as PostgreSQL orders them
+  return (value == NO_SEQUENCE, value)
+
+class CatalogSnapshot:
+  # Read-only, columnar copy of the catalog for one catalog version: parallel
+  # arrays of ids/sequences, interned names (a subcategory name shared by many
+  # categories is stored once) and category -> subcategory adjacency. Rows are
+  # identified by their position; every array is ordered by id.
+  def __init__(self, categories, subcategories, version=None):
+    # categories: (id, name, sequence), subcategories: (id, category id, name, sequence), both by id
+    # Catalog version the rows were read at
+    self.version = version
+    self.category_ids = array("q")
+    self.category_names = []
+    self.category_sequences = array("q")
+    self.category_positions = {}
+
+    for pk, name, sequence in categories:
+      self.category_positions[pk] = len(self.category_ids)
+      self.category_ids.append(pk)
+      self.category_names.append(sys.intern(name))
+      self.category_sequences.append(_sequence(sequence))
+
+    self.subcategory_ids = array("q")
+    self.subcategory_names = []
+    self.subcategory_sequences = array("q")
+    # Position of each subcategory's category
+    self.subcategory_category = array("I")
+    # Category position -> positions of its subcategories
+    self.subcategories_of = [array("I") for _ in self.category_ids]
+    self.subcategory_positions = {}
+
+    for pk, category_id, name, sequence in subcategories:
+      category = self.category_positions.get(category_id)
+      if category is None:
+        # Category written after it was read, the version bump rebuilds this
+        continue
+      position = len(self.subcategory_ids)
+      self.subcategory_positions[pk] = position
+      self.subcategory_ids.append(pk)
+      self.subcategory_names.append(sys.intern(name))
+      self.subcategory_sequences.append(_sequence(sequence))
+      self.subcategory_category.append(category)
+      self.subcategories_of[category].append(position)
+
+  def category_sequence(self, position):
+    sequence = self.category_sequences[position]
+    return None if sequence == NO_SEQUENCE else sequence
+
+  def subcategory_sequence(self, position):
+    sequence = self.subcategory_sequences[position]
+    return None if sequence == NO_SEQUENCE else sequence
+
+  def category_row(self, position):
+    return CategoryRow(self.category_ids[position], self.category_names[position], self.category_sequence(position))
+
+  def subcategory_row(self, position):
+    return SubCategoryRow(
+      self.subcategory_ids[position],
+      self.subcategory_names[position],
+      self.subcategory_sequence(position),
+      self.category_row(self.subcategory_category[position]),
+    )
+
+  def category_rows(self, ids):
+    # Rows for the given ids in that order, unknown ids are skipped
+    positions = self.category_positions
+    return [self.category_row(positions[pk]) for pk in ids if pk in positions]
+
+  def subcategory_rows(self, ids):
+    positions = self.subcategory_positions
+    return [self.subcategory_row(positions[pk]) for pk in ids if pk in positions]
+
+  def categories_in_export_order(self):
+    # Positions ordered by (sequence, name)
+    return sorted(
+      range(len(self.category_ids)),
+      key=lambda p: (_sequence_key(self.category_sequences[p]), self.category_names[p]),
+    )
+
+  def subcategories_in_export_order(self):
+    # Positions ordered by (category sequence, category name, sequence, name)
+    rank = {category: i for i, category in enumerate(self.categories_in_export_order())}
+    return sorted(
+      range(len(self.subcategory_ids)),
+      key=lambda p: (
+        rank[self.subcategory_category[p]],
+        _sequence_key(self.subcategory_sequences[p]),
+        self.subcategory_names[p],
+      ),
+    )
+
+_snapshot = None
+_lock = threading.Lock()
+
+def _load_snapshot(version):
+  categories = (
+    Category.objects.order_by("id").values_list("id", "name", "sequence").iterator(chunk_size=SNAPSHOT_CHUNK_SIZE)
+  )
+  subcategories = (
+    SubCategory.objects
+    .order_by("id")
+    .values_list("id", "category_id", "name", "sequence")
+    .iterator(chunk_size=SNAPSHOT_CHUNK_SIZE)
+  )
+  return CatalogSnapshot(categories, subcategories, version)
+
+def get_snapshot():
+  # The process-wide snapshot, reloaded lazily when the catalog version moves
+  global _snapshot
+  version = get_catalog_version()
+  cached = _snapshot
+  if cached and cached[0] == version:
+    return cached[1]
+
+  with _lock:
+    cached = _snapshot
+    if cached and cached[0] == version:
+      return cached[1]
+    # Read the version first: a write during the load bumps it again afterwards
+    snapshot = _load_snapshot(version)
+    _snapshot = (version, snapshot)
+    return snapshot
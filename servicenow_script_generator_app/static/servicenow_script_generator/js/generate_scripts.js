@@ -2,7 +2,16 @@
 document.getElementById("generate-form").addEventListener("submit", function (e) {
   e.preventDefault(); // stop page reload
 
-  fetch("/generate_scripts/", {
+  // Pick the script output format
+  const format = document.getElementById("script-format").value;
+  let query = "";
+  if (format === "compact") {
+    query = "?format=compact";
+  } else if (format === "compact-minified") {
+    query = "?format=compact&minify=1";
+  }
+
+  fetch("/generate_scripts/" + query, {
     method: "GET",
     headers: {
       "X-Requested-With": "XMLHttpRequest", // mark as AJAX
@@ -0,0 +1,33 @@
+// home.js
+// Poll background CSV import jobs and show their progress/result
+function pollImportJob(element) {
+  const url = element.dataset.importJobUrl;
+
+  fetch(url)
+    .then((response) => {
+      if (!response.ok) {
+        throw new Error(`Import status returned ${response.status}`);
+      }
+      return response.json();
+    })
+    .then((job) => {
+      // Done, failed, or interrupted by a restart (reported as failed): stop polling
+      if (job.finished) {
+        element.textContent = job.message;
+        return;
+      }
+      if (job.status === "running") {
+        element.textContent = `⏳ Importing ${job.file_name}... ${job.rows_processed} rows read`;
+      }
+      setTimeout(() => pollImportJob(element), 1000);
+    })
+    .catch((error) => {
+      // The job is gone or the server can't tell, polling again won't help
+      console.error("Error:", error);
+      element.textContent = "⚠️ Lost track of this import, reload the page to check the catalog.";
+    });
+}
+
+document.addEventListener("DOMContentLoaded", function () {
+  document.querySelectorAll("[data-import-job-url]").forEach(pollImportJob);
+});
@@ -0,0 +1,47 @@
+// view_cat_subcat.js
+// Typeahead suggestions for the search boxes, served by /search/
+function attachTypeahead(input, getType) {
+  const list = document.createElement("datalist");
+  list.id = input.name + "-suggestions";
+  input.setAttribute("list", list.id);
+  input.setAttribute("autocomplete", "off");
+  input.after(list);
+
+  let timer = null;
+  input.addEventListener("input", function () {
+    clearTimeout(timer);
+    const query = input.value.trim();
+    if (!query) {
+      list.innerHTML = "";
+      return;
+    }
+
+    // wait for a pause in typing before asking the server
+    timer = setTimeout(function () {
+      fetch(`/search/?type=${getType()}&limit=10&q=${encodeURIComponent(query)}`)
+        .then((response) => response.json())
+        .then((data) => {
+          list.innerHTML = "";
+          new Set(data.results.map((result) => result.name)).forEach((name) => {
+            const option = document.createElement("option");
+            option.value = name;
+            list.appendChild(option);
+          });
+        })
+        .catch((error) => console.error("Typeahead failed:", error));
+    }, 150);
+  });
+}
+
+document.addEventListener("DOMContentLoaded", function () {
+  const categoryInput = document.querySelector('input[name="category_search"][type="text"]');
+  const subcategoryInput = document.querySelector('input[name="subcategory_search"][type="text"]');
+  const searchBy = document.querySelector('select[name="search_by"]');
+
+  if (categoryInput) {
+    attachTypeahead(categoryInput, () => "category");
+  }
+  if (subcategoryInput) {
+    attachTypeahead(subcategoryInput, () => (searchBy && searchBy.value === "category" ? "category" : "subcategory"));
+  }
+});
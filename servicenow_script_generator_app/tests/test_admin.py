@@ -0,0 +1,29 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from ..models import Category
+
+# The admin pages render without collectstatic's manifest
+@override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+class CatalogSearchOrderTests(TestCase):
+  def setUp(self):
+    for name in ("Zeta network", "Networking", "network", "Mobile network"):
+      Category.objects.create(name=name)
+    User.objects.create_superuser("admin", "admin@example.com", "password")
+    self.client.login(username="admin", password="password")
+
+  def test_changelist_lists_best_matches_first(self):
+    response = self.client.get("/admin/servicenow_script_generator_app/category/", {"q": "network"})
+    names = [category.name for category in response.context["cl"].result_list]
+    self.assertEqual(names, ["network", "Networking", "Mobile network", "Zeta network"])
+
+  def test_clicked_column_still_sorts(self):
+    response = self.client.get("/admin/servicenow_script_generator_app/category/", {"q": "network", "o": "1"})
+    names = [category.name for category in response.context["cl"].result_list]
+    self.assertEqual(names, sorted(names))
+
+  def test_autocomplete_lists_best_matches_first(self):
+    response = self.client.get("/admin/autocomplete/", {
+      "app_label": "servicenow_script_generator_app", "model_name": "subcategory",
+      "field_name": "category", "term": "network",
+    })
+    self.assertEqual([result["text"] for result in response.json()["results"]][:2], ["network", "Networking"])
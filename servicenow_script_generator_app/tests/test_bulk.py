@@ -0,0 +1,90 @@
+from unittest import skipUnless
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase
+from ..bulk import LOAD_BATCH_SIZE, _CopyStream, bulk_load, clear_catalog, clear_subcategories
+from ..models import Category, SubCategory
+
+# Names COPY's CSV format has to quote: separators, quotes, backslashes, newlines
+AWKWARD_NAMES = ['Comma, Inc', 'Say "hi"', 'Back\\slash', 'Two\nlines', '\\N', '']
+
+class CopyStreamTests(SimpleTestCase):
+  def test_reads_in_any_chunk_size(self):
+    rows = [(name, i) for i, name in enumerate(AWKWARD_NAMES)] + [(None, None)]
+    whole = _CopyStream(rows).read()
+    for size in (1, 3, 7, 64 * 1024):
+      stream = _CopyStream(rows)
+      chunks = []
+      while data := stream.read(size):
+        self.assertLessEqual(len(data), size)
+        chunks.append(data)
+      self.assertEqual("".join(chunks), whole)
+
+  def test_null_is_unquoted(self):
+    self.assertEqual(_CopyStream([(None, "\\N")]).read(), '\\N,"\\N"\n')
+
+class BulkLoadTests(TestCase):
+  # Runs against whichever loader the test database uses
+  def test_loads_rows_and_keeps_the_first_duplicate(self):
+    rows = [(name, i) for i, name in enumerate(AWKWARD_NAMES)] + [("comma,  inc", 99), ("Blank", None)]
+    inserted = bulk_load(Category, ["name", "sequence"], iter(rows))
+    self.assertEqual(inserted, len(AWKWARD_NAMES) + 1)
+    self.assertEqual(
+      dict(Category.objects.values_list("name", "sequence")),
+      {**{name: i for i, name in enumerate(AWKWARD_NAMES)}, "Blank": None},
+    )
+
+  def test_more_rows_than_a_batch(self):
+    count = LOAD_BATCH_SIZE * 2 + 1
+    inserted = bulk_load(Category, ["name", "sequence"], ((f"Category {i}", i) for i in range(count)))
+    self.assertEqual(inserted, count)
+    self.assertEqual(Category.objects.count(), count)
+
+  def test_subcategories_take_the_category_id(self):
+    network = Category.objects.create(name="Network")
+    inserted = bulk_load(SubCategory, ["category", "name", "sequence"], [(network.id, "Wifi", 1), (network.id, "WIFI", 2)])
+    self.assertEqual(inserted, 1)
+    self.assertEqual(list(network.subcategories.values_list("name", "normalized_name")), [("Wifi", "wifi")])
+
+class BulkClearTests(TestCase):
+  def setUp(self):
+    for name in ("Network", "Hardware"):
+      category = Category.objects.create(name=name)
+      SubCategory.objects.create(category=category, name="Other")
+
+  def test_clear_subcategories(self):
+    self.assertEqual(clear_subcategories(), 2)
+    self.assertFalse(SubCategory.objects.exists())
+    self.assertEqual(Category.objects.count(), 2)
+
+  def test_clear_catalog_then_reload_in_one_transaction(self):
+    # What a replace import does: the deleted names can be inserted again
+    with transaction.atomic():
+      self.assertEqual(clear_catalog(), (2, 2))
+      self.assertEqual(bulk_load(Category, ["name", "sequence"], [("Network", 1)]), 1)
+    self.assertEqual(list(Category.objects.values_list("name", flat=True)), ["Network"])
+    self.assertFalse(SubCategory.objects.exists())
+
+# To run these, point the tests at PostgreSQL (the test database is created
+# next to the one in the URL, the user needs CREATEDB):
+#   DATABASE_URL=postgres://<user>:<pass>@<host>:<port>/<dbname> python manage.py test
+@skipUnless(connection.vendor == "postgresql", "COPY loading needs PostgreSQL, set DATABASE_URL=postgres://...")
+class CopyLoadTests(TestCase):
+  def test_copy_keeps_input_order_on_conflicts(self):
+    rows = [(f"Name {i % 50}", i) for i in range(200)]
+    self.assertEqual(bulk_load(Category, ["name", "sequence"], rows), 50)
+    self.assertEqual(sorted(Category.objects.values_list("sequence", flat=True)), list(range(50)))
+
+  def test_two_loads_in_one_transaction(self):
+    # The staging table is dropped after each load, so its name can be reused
+    with transaction.atomic():
+      bulk_load(Category, ["name", "sequence"], [("First", 1)])
+      bulk_load(Category, ["name", "sequence"], [("Second", 2), ("first", 3)])
+    self.assertEqual(list(Category.objects.order_by("sequence").values_list("name", flat=True)), ["First", "Second"])
+
+  def test_failed_load_rolls_back(self):
+    with self.assertRaises(Exception):
+      with transaction.atomic():
+        bulk_load(Category, ["name", "sequence"], [("Fine", 1), ("Bad", "not a number")])
+    self.assertFalse(Category.objects.exists())
+    # And the staging table went with it
+    self.assertEqual(bulk_load(Category, ["name", "sequence"], [("Fine", 1)]), 1)
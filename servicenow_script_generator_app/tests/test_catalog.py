@@ -0,0 +1,25 @@
+from django.test import TestCase
+from ..catalog import _bump, get_catalog_version, get_catalog_last_modified
+from ..models import CatalogVersion, Category
+
+class CatalogVersionTests(TestCase):
+  def test_created_on_first_read(self):
+    CatalogVersion.objects.all().delete()
+    version = get_catalog_version()
+    self.assertEqual(CatalogVersion.objects.get().version, version)
+
+  def test_every_bump_counts(self):
+    # Two writes committing together each move the version on, none is lost
+    version = get_catalog_version()
+    _bump()
+    _bump()
+    self.assertEqual(get_catalog_version(), version + 2)
+
+  def test_bumped_after_commit(self):
+    version = get_catalog_version()
+    modified = get_catalog_last_modified()
+    with self.captureOnCommitCallbacks(execute=True):
+      Category.objects.create(name="Network")
+      self.assertEqual(get_catalog_version(), version)
+    self.assertEqual(get_catalog_version(), version + 1)
+    self.assertGreaterEqual(get_catalog_last_modified(), modified)
@@ -0,0 +1,53 @@
+import itertools, random
+from difflib import SequenceMatcher
+from django.test import SimpleTestCase
+from ..duplicates import similar_pairs
+
+def brute_force_pairs(texts, threshold):
+  # Every pair scored the way similar_pairs scores them
+  return {
+    (i, j)
+    for i, j in itertools.combinations(range(len(texts)), 2)
+    if SequenceMatcher(None, texts[i], texts[j], autojunk=False).ratio() >= threshold
+  }
+
+def typo(rng, text):
+  # One to three deletions, insertions, substitutions or transpositions
+  for _ in range(rng.randint(1, 3)):
+    i = rng.randrange(len(text) + 1)
+    edit = rng.choice("dist")
+    if edit == "d":
+      text = text[:i] + text[i + 1:]
+    elif edit == "i":
+      text = text[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + text[i:]
+    elif edit == "s":
+      text = text[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + text[i + 1:]
+    else:
+      text = text[:i] + text[i + 1:i + 2] + text[i:i + 1] + text[i + 2:]
+  return text or "x"
+
+def random_corpus(seed, size=400):
+  # Short words over a small alphabet, so many names are close to each other
+  rng = random.Random(seed)
+  words = ["".join(rng.choice("abcdeilnorst") for _ in range(rng.randint(2, 8))) for _ in range(300)]
+  texts = set()
+  while len(texts) < size:
+    text = " ".join(rng.sample(words, rng.randint(1, 3)))
+    texts.add(text)
+    if rng.random() < 0.4:
+      texts.add(typo(rng, text))
+  return sorted(texts)
+
+class SimilarPairsTests(SimpleTestCase):
+  def test_unmatched_characters_on_both_sides(self):
+    self.assertEqual([(i, j) for i, j, _ in similar_pairs(["printer", "pinqter"], 0.85)], [(0, 1)])
+
+  def test_matches_brute_force(self):
+    for seed in (1, 2):
+      texts = random_corpus(seed)
+      for threshold in (0.6, 0.7, 0.85, 0.95):
+        with self.subTest(seed=seed, threshold=threshold):
+          found = similar_pairs(texts, threshold)
+          self.assertEqual({(i, j) for i, j, _ in found}, brute_force_pairs(texts, threshold))
+          for i, j, similarity in found:
+            self.assertGreaterEqual(similarity, threshold)
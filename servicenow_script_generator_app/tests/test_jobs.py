@@ -0,0 +1,53 @@
+import os, tempfile, threading
+from datetime import timedelta
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from ..jobs import fail_stale_jobs, run_import_job
+from ..models import ImportJob
+
+class JobMixin:
+  def make_job(self, status, heartbeat_age):
+    handle, path = tempfile.mkstemp(suffix=".csv")
+    os.close(handle)
+    self.addCleanup(lambda: os.path.exists(path) and os.remove(path))
+    return ImportJob.objects.create(
+      kind=ImportJob.CATEGORY, status=status, file_name="c.csv", file_path=path,
+      heartbeat_at=timezone.now() - timedelta(seconds=heartbeat_age),
+    )
+
+@override_settings(IMPORT_JOB_STALE_SECONDS=300)
+class StaleJobTests(JobMixin, TestCase):
+  def test_status_read_fails_an_orphaned_job(self):
+    job = self.make_job(ImportJob.RUNNING, 600)
+    status = self.client.get(reverse("import_job_status", args=[job.pk])).json()
+    self.assertEqual(status["status"], ImportJob.FAILED)
+    self.assertTrue(status["finished"])
+    self.assertFalse(os.path.exists(job.file_path))
+
+  def test_live_and_finished_jobs_are_left_alone(self):
+    live = self.make_job(ImportJob.QUEUED, 10)
+    done = self.make_job(ImportJob.DONE, 600)
+    self.assertEqual(fail_stale_jobs(), [])
+    self.assertEqual(self.client.get(reverse("import_job_status", args=[live.pk])).json()["status"], ImportJob.QUEUED)
+    done.refresh_from_db()
+    self.assertEqual(done.status, ImportJob.DONE)
+    self.assertTrue(os.path.exists(done.file_path))
+
+  def test_jobs_without_a_heartbeat_go_by_creation_time(self):
+    job = self.make_job(ImportJob.QUEUED, 0)
+    ImportJob.objects.filter(pk=job.pk).update(heartbeat_at=None, created_at=timezone.now() - timedelta(hours=1))
+    self.assertEqual(fail_stale_jobs(), [job.pk])
+
+@override_settings(IMPORT_JOB_STALE_SECONDS=300)
+class QueuedJobTests(JobMixin, TransactionTestCase):
+  # Jobs run on a pool thread with their own connection, which they close
+  def test_a_failed_job_is_not_started(self):
+    job = self.make_job(ImportJob.QUEUED, 600)
+    fail_stale_jobs()
+    worker = threading.Thread(target=run_import_job, args=(job.pk,))
+    worker.start()
+    worker.join()
+    job.refresh_from_db()
+    self.assertEqual(job.status, ImportJob.FAILED)
+    self.assertIsNone(job.started_at)
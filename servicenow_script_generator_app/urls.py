@@ -13,15 +13,22 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
-from . import views
+from . import views, async_views
+
+# Exports, script generation and uploads have async versions for ASGI servers
+heavy_views = async_views if settings.ASYNC_VIEWS else views
 
 
 urlpatterns = [
     path('', views.home, name='home'),
     path('admin/', admin.site.urls),
     path("view/", views.view_cat_subcat, name="view_cat_subcat"),
+    path("search/", views.search_catalog, name="search_catalog"),
+    path("duplicates/", heavy_views.near_duplicates, name="near_duplicates"),
+    path("api/duplicates/", heavy_views.near_duplicates_api, name="near_duplicates_api"),
 
     # Category CRUD
     path("category/<int:pk>/edit/", views.edit_category, name="edit_category"),
@@ -35,18 +42,26 @@ urlpatterns = [
 
     # Add Category/SubCategory page
     path("add_cat_subcat/", views.add_cat_subcat, name="add_cat_subcat"),
+    path("api/add_combos/", views.add_combos_api, name="add_combos_api"),
 
     # Generate SNOW scripts page
     path("generate_scripts_page/", views.generate_scripts_page, name="generate_scripts_page"),
 
     # Handle csv uploads
-    path("upload_category_csv/", views.upload_category_csv, name="upload_category_csv"),
-    path("upload_subcategory_csv/", views.upload_subcategory_csv, name="upload_subcategory_csv"),
+    path("upload_category_csv/", heavy_views.upload_category_csv, name="upload_category_csv"),
+    path("upload_subcategory_csv/", heavy_views.upload_subcategory_csv, name="upload_subcategory_csv"),
+    path("validate_import/<str:kind>/", heavy_views.validate_import, name="validate_import"),
+    path("import_jobs/<int:pk>/", views.import_job_status, name="import_job_status"),
 
     # Generate excel files for SNOW upload
-    path("generate_category_excel/", views.generate_category_excel, name="generate_category_excel"),
-    path("generate_subcategory_excel/", views.generate_subcategory_excel, name="generate_subcategory_excel"),
+    path("generate_category_excel/", heavy_views.generate_category_excel, name="generate_category_excel"),
+    path("generate_subcategory_excel/", heavy_views.generate_subcategory_excel, name="generate_subcategory_excel"),
 
     # Generate actual SNOW scripts
-    path("generate_scripts/", views.generate_scripts, name="generate_scripts"),
+    path("generate_scripts/", heavy_views.generate_scripts, name="generate_scripts"),
+    path("download_script/<str:script>/", heavy_views.download_script, name="download_script"),
+    path("script_patch/", views.script_patch, name="script_patch"),
+
+    # Request metrics in the Prometheus text format
+    path("metrics", views.metrics, name="metrics"),
 ]
@@ -1,24 +1,71 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from .models import Category, SubCategory
+from django.template.loader import render_to_string
+from .models import Category, SubCategory, ImportJob
+from .imports import add_combos, iter_category_validation, iter_subcategory_validation, ROW_READERS
+from .bulk import clear_catalog, clear_subcategories
+from .jobs import enqueue_import, job_status
+from .exports import excel_response, category_export_rows, subcategory_export_rows
+from .pagination import get_page_size, keyset_page_from_ids, PAGE_SIZE_CHOICES
+from .search import get_index, search_category_ids, search_subcategory_ids
+from .snapshot import get_snapshot
+from .catalog import get_catalog_version, get_catalog_last_modified, catalog_cache_key
+from .metrics import render_metrics
+from .patches import record_revision, get_script_patch
+from .duplicates import get_duplicates, parse_threshold, DUPLICATE_KINDS
+from .scripts import (
+  get_cached_scripts, load_script_mappings, iter_script_bytes, iter_scripts_zip, iter_gzip, SCRIPT_SOURCES,
+  STREAM_CHUNK_SIZE,
+)
+from django.conf import settings
 from django.contrib import messages
-from collections import defaultdict
-from django.http import JsonResponse, HttpResponse
-from openpyxl.utils import get_column_letter
-import json, csv, openpyxl
+from django.core.cache import cache
+from django.db import transaction, IntegrityError
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, Http404
+from django.utils.cache import patch_vary_headers
+from django.utils.http import content_disposition_header
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+import hashlib, json, logging, os, re
+
+logger = logging.getLogger(__name__)
+
+ACCEPTS_GZIP_RE = re.compile(r"\bgzip\b")
 
 def home(request):
   # GET request – just render everything
   return render(request, "home.html")
 
-def view_cat_subcat(request):
-  # GET request – just render everything
-  categories = Category.objects.prefetch_related("subcategories").all()
-  subcategories = SubCategory.objects.select_related("category").all()
+def catalog_etag(request, *args, **kwargs):
+  return f"catalog-{get_catalog_version()}"
+
+def catalog_last_modified(request, *args, **kwargs):
+  return get_catalog_last_modified()
+
+def catalog_page_etag(request, *args, **kwargs):
+  # HTML pages also embed the CSRF token, so a new CSRF cookie (e.g. after
+  # login) must not be answered with a 304 of the old page
+  csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME, "")
+  return f"{catalog_etag(request)}-{hashlib.md5(csrf_cookie.encode()).hexdigest()[:12]}"
+
+def catalog_tables(request, page_size):
+  # Counts and rendered tables of view_cat_subcat. They only change with the
+  # catalog, so they are cached under its version and a hit only reads the version.
+  # The page around them (forms, CSRF tokens) is rendered per request.
+  params = hashlib.md5(request.GET.urlencode().encode()).hexdigest()
+  key = catalog_cache_key(f"view:{page_size}:{params}")
+  tables = cache.get(key)
+  if tables is not None:
+    return tables
+
+  # Pages come from the shared catalog snapshot, search from the search index
+  snapshot = get_snapshot()
 
-  # Category search
   category_search = request.GET.get("category_search", "").strip()
   if category_search:
-    categories = categories.filter(name__icontains=category_search)
+    category_ids = search_category_ids(category_search)
+  else:
+    category_ids = snapshot.category_ids
+  category_page = keyset_page_from_ids(request, category_ids, snapshot.category_rows, "cat", page_size)
 
   # Subcategory search
   sub_search = request.GET.get("subcategory_search", "").strip()
@@ -26,26 +73,83 @@ def view_cat_subcat(request):
   search_by = request.GET.get("search_by", "subcategory")
 
   if sub_search:
-    if search_by == "category":
-      subcategories = subcategories.filter(category__name__icontains=sub_search)
-    # search by subcategory name
-    else:  
-      subcategories = subcategories.filter(name__icontains=sub_search)
-
+    subcategory_ids = search_subcategory_ids(sub_search, search_by)
+  else:
+    subcategory_ids = snapshot.subcategory_ids
+  subcategory_page = keyset_page_from_ids(request, subcategory_ids, snapshot.subcategory_rows, "sub", page_size)
+
+  tables = {
+    "category_count": len(category_ids),
+    "subcategory_count": len(subcategory_ids),
+    "category_table": render_to_string("category_table.html", {
+      "categories": category_page["rows"],
+      "page": category_page,
+    }),
+    "subcategory_table": render_to_string("subcategory_table.html", {
+      "subcategories": subcategory_page["rows"],
+      "page": subcategory_page,
+    }),
+  }
+  cache.set(key, tables)
+  return tables
+
+# Analysts revalidate and get a 304 while the catalog (and their CSRF cookie) is unchanged
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=catalog_page_etag, last_modified_func=catalog_last_modified)
+def view_cat_subcat(request):
+  # GET request – render one keyset page of each table
+  page_size = get_page_size(request)
   return render(request, "view_cat_subcat.html", {
-    "categories": categories,
-    "subcategories": subcategories,
-    "category_count": categories.count(),
-    "subcategory_count": subcategories.count(),
+    **catalog_tables(request, page_size),
+    "page_size": page_size,
+    "page_size_choices": PAGE_SIZE_CHOICES,
   })
 
-# Helper function to normalize names
-def normalize_name(name):
-  #Normalize names for comparison (remove casing and spacing)
-  if not name:
-      return ""
-  return "".join(name.lower().split())
+def duplicate_params(request):
+  # ?kind=subcategory|category&threshold=<0.6-0.99>
+  kind = request.GET.get("kind")
+  if kind not in DUPLICATE_KINDS:
+    kind = DUPLICATE_KINDS[0]
+  return kind, parse_threshold(request.GET.get("threshold"))
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=catalog_page_etag, last_modified_func=catalog_last_modified)
+def near_duplicates(request):
+  # Report page: groups of similar names, one keyset page at a time
+  kind, threshold = duplicate_params(request)
+  groups = get_duplicates(kind, threshold)
+  page_size = get_page_size(request)
+  return render(request, "near_duplicates.html", {
+    "kind": kind,
+    "threshold": threshold,
+    "group_count": len(groups),
+    # Groups are identified by their position in the report
+    "page": keyset_page_from_ids(request, range(len(groups)), lambda ids: [groups[i] for i in ids], "group", page_size),
+    "page_size": page_size,
+    "page_size_choices": PAGE_SIZE_CHOICES,
+  })
 
+@cache_control(no_cache=True)
+@condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
+def near_duplicates_api(request):
+  kind, threshold = duplicate_params(request)
+  groups = get_duplicates(kind, threshold)
+  return JsonResponse({"kind": kind, "threshold": threshold, "group_count": len(groups), "groups": groups})
+
+def search_catalog(request):
+  # JSON typeahead: ?q=<text>&type=category|subcategory&limit=<n>
+  query = request.GET.get("q", "").strip()
+  kind = "category" if request.GET.get("type") == "category" else "subcategory"
+  try:
+    limit = min(max(int(request.GET.get("limit", 10)), 1), 50)
+  except ValueError:
+    limit = 10
+
+  results = get_index(kind).rank(query, limit) if query else []
+  return JsonResponse({"query": query, "type": kind, "results": results})
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=catalog_page_etag, last_modified_func=catalog_last_modified)
 def add_cat_subcat(request):
   if request.method == "POST":
     # Add all combos (JSON payload from hidden input)
@@ -59,71 +163,55 @@ def add_cat_subcat(request):
       try:
         all_combos = json.loads(all_combos_json)
 
-        # Build a lookup of normalized categories for fast access
-        existing_categories = {
-          normalize_name(cat.name): cat for cat in Category.objects.all()
-        }
-
-        # Build a lookup of (category_id, normalized_sub_name) normalized subcategories  for fast lookup
-        existing_sub_pairs = {
-          (sub.category_id, normalize_name(sub.name))
-          for sub in SubCategory.objects.select_related("category").all()
-        }
-        
-        # Make sure duplciates doesn't exist in SNOW tables and add if they are unique
-        for combo in all_combos:
-          category_name = combo.get("category", "").strip()
-          subcategories = [
-            s.strip() for s in combo.get("subcategories", []) if s.strip()
-          ]
-
-          normalized_category = normalize_name(category_name)
-
-          # If normalized_category NOT in existing_categories, create it
-          if normalized_category not in existing_categories:
-            category = Category.objects.create(
-              name=category_name,
-              sequence=None   
-            )
-            existing_categories[normalized_category] = category
-          else:
-            category = existing_categories[normalized_category]
-
-          # Add only unique (category, subcategory) pairs. 
-          for sub_name in subcategories:
-            normalized_sub = normalize_name(sub_name)
-            pair = (category.id, normalized_sub)
-
-            if pair not in existing_sub_pairs:
-              SubCategory.objects.create(
-                category=category,
-                name=sub_name,
-                sequence=None 
-              )
-              existing_sub_pairs.add(pair)
-
-      except json.JSONDecodeError:
-        print("Invalid JSON payload for all_combos.")
+        # Make sure duplicates don't exist in SNOW tables and add if they are unique
+        add_combos(all_combos)
+
+      # JSONDecodeError is a ValueError too
+      except ValueError as e:
+        logger.warning("Invalid JSON payload for all_combos: %s", e)
 
     # Redirect to add_to_snow page after processing
       return redirect("generate_scripts_page")
 
-  # GET request – just render everything
-  categories = Category.objects.prefetch_related("subcategories").all()
-  return render(request, "add_cat_subcat.html", {"categories": categories})
+  # GET request – the combo table is filled in client-side, nothing to query
+  return render(request, "add_cat_subcat.html")
+
+def add_combos_api(request):
+  # JSON version of add_cat_subcat. POST a list of combos (or {"combos": [...]})
+  # and get back created/skipped counts per combo.
+  if request.method != "POST":
+    return JsonResponse({"error": "POST a JSON list of combos."}, status=405)
+
+  try:
+    payload = json.loads(request.body)
+    if isinstance(payload, dict):
+      payload = payload.get("combos")
+    result = add_combos(payload)
+  except ValueError as e:
+    return JsonResponse({"error": str(e)}, status=400)
+
+  return JsonResponse(result)
 
 # CRUD: Category
 def edit_category(request, pk):
   category = get_object_or_404(Category, pk=pk)
+  error = None
   if request.method == "POST":
     new_name = request.POST.get("name", "").strip()
     if new_name:
       category.name = new_name
-      category.save()
-      return redirect("view_cat_subcat")
+      try:
+        with transaction.atomic():
+          category.save()
+      except IntegrityError:
+        # normalized_name is unique
+        error = f"A category named '{new_name}' already exists."
+      else:
+        return redirect("view_cat_subcat")
   return render(request, "edit.html", {
     "object": category,
-    "type": "Category"
+    "type": "Category",
+    "error": error,
   })
 
 def delete_category(request, pk):
@@ -148,22 +236,34 @@ def delete_category(request, pk):
     
 def delete_all_categories(request):
   if request.method == "POST":
-    Category.objects.all().delete()
-    messages.success(request, "All categories have been deleted.")
+    # Subcategories go too, they can't exist without their category
+    categories_deleted, subcategories_deleted = clear_catalog()
+    messages.success(
+      request,
+      f"All categories have been deleted ({categories_deleted} categories, {subcategories_deleted} subcategories)."
+    )
   return redirect("view_cat_subcat")
 
 # CRUD: SubCategory
 def edit_subcategory(request, pk):
   sub = get_object_or_404(SubCategory, pk=pk)
+  error = None
   if request.method == "POST":
     new_name = request.POST.get("name", "").strip()
     if new_name:
       sub.name = new_name
-      sub.save()
-      return redirect("view_cat_subcat")
+      try:
+        with transaction.atomic():
+          sub.save()
+      except IntegrityError:
+        # normalized_name is unique per category
+        error = f"A subcategory named '{new_name}' already exists."
+      else:
+        return redirect("view_cat_subcat")
   return render(request, "edit.html", {
     "object": sub,
-    "type": "Subcategory"
+    "type": "Subcategory",
+    "error": error,
   })
 
 def delete_subcategory(request, pk):
@@ -179,387 +279,183 @@ def delete_subcategory(request, pk):
 
 def delete_all_subcategories(request):
   if request.method == "POST":
-    SubCategory.objects.all().delete()
-    messages.success(request, "All subcategories have been deleted.")
+    deleted = clear_subcategories()
+    messages.success(request, f"All subcategories have been deleted ({deleted} subcategories).")
   return redirect("view_cat_subcat")
 
 def generate_scripts_page(request):
   return render(request, "generate_scripts.html")
 
+def is_import_file(file_name):
+  return os.path.splitext(file_name)[1].lower() in ROW_READERS
+
+def import_mode(request):
+  # "delta" only applies the differences, anything else replaces the table
+  if request.POST.get("mode") == ImportJob.DELTA:
+    return ImportJob.DELTA
+  return ImportJob.REPLACE
+
 def upload_category_csv(request):
   upload_message = None
-  categories = Category.objects.all()
+  job = None
 
   if request.method == "POST" and request.FILES.get("category_csv_file"):
     csv_file = request.FILES["category_csv_file"]
 
-    if not csv_file.name.endswith('.csv'):
-      upload_message = "❌ Please upload a valid CSV file."
+    if not is_import_file(csv_file.name):
+      upload_message = "❌ Please upload a valid CSV or Excel (.xlsx) file."
     else:
-      # Read and decode the file
-      decoded_file = csv_file.read().decode("utf-8").splitlines()
-      reader = csv.DictReader(decoded_file)
-
-      # Clear old categories
-      Category.objects.all().delete()
-
-      # Use a dict to prevent duplicates
-      categories_dict = {}
-
-      # Track skipped rows
-      not_added = []
-
-      for row in reader:
-        value = row.get("value").strip()
-        inactive = row.get("inactive").lower()
-        sequence_raw = row.get("sequence", "").strip()
-
-        # skip inactive rows 
-        if inactive == "true":
-          not_added.append(f"{value} (is inactive)")
-          continue  
-        
-        # Normalize key
-        normalized_key = "".join(value.lower().split())  # lower + remove spaces
-
-        # Only add if not already present
-        if normalized_key not in categories_dict:
-          sequence = int(sequence_raw) if sequence_raw.isdigit() else None
-
-          categories_dict[normalized_key] = {
-            "name": value,
-            "sequence": sequence,
-          }
-
-        # Convert to model instances
-        categories_to_create = [
-          Category(name=data["name"], sequence=data["sequence"])
-          for data in categories_dict.values()
-        ]
-
-      Category.objects.bulk_create(categories_to_create)
-
-      success_count = len(categories_to_create)
-
-      # Build upload message to match subcategory style
-      if not_added:
-        upload_message = (
-          f"✅ Uploaded {success_count} categories.\n"
-          f"⚠️ Skipped {len(not_added)} categories:\n"
-          + ", ".join(not_added)
-        )
-      else:
-        upload_message = f"✅ Successfully uploaded all {success_count} categories from CSV."
-
-      categories = Category.objects.all()
+      # Import in the background, home.html polls the job for progress
+      job = enqueue_import(ImportJob.CATEGORY, csv_file, import_mode(request))
 
   return render(request, "home.html", {
-    "categories": categories,
+    "category_job": job,
     "category_message": upload_message
   })
 
 def upload_subcategory_csv(request):
   upload_message = None
-  subcategories = SubCategory.objects.select_related("category").all()
+  job = None
 
   if request.method == "POST" and request.FILES.get("subcategory_csv_file"):
     csv_file = request.FILES["subcategory_csv_file"]
 
-    if not csv_file.name.endswith(".csv"):
-      upload_message = "❌ Please upload a valid CSV file."
+    if not is_import_file(csv_file.name):
+      upload_message = "❌ Please upload a valid CSV or Excel (.xlsx) file."
     else:
-      # Read and decode the file
-      decoded_file = csv_file.read().decode("utf-8").splitlines()
-      reader = csv.DictReader(decoded_file)
-
-      # Clear old subcategories
-      SubCategory.objects.all().delete()
-
-      # Prevent duplicates using normalized keys
-      subcategory_dict = {}
-
-      # Track skipped rows
-      not_added = []
-
-      for row in reader:
-        value = row.get("value").strip()
-        inactive = row.get("inactive", "").strip().lower()
-        category_name = row.get("dependent_value").strip() or ""
-        sequence_raw = row.get("sequence", "").strip()
-
-        # Skip invalid rows
-        if inactive != "false":
-          not_added.append(f"{value} (is inactive)")
-          continue
-
-        try:
-          category = Category.objects.get(name=category_name)
-        except Category.DoesNotExist:
-          not_added.append(f"{value} (category missing or doesn't match what's in Category table)")
-          continue
-
-        # Normalize key by combining category + subcategory
-        normalized_key = (
-          "".join(category_name.lower().split())
-          + "|"
-          + "".join(value.lower().split())
-        )
-
-        # Add only if unique for that category
-        if normalized_key not in subcategory_dict:
-          sequence = int(sequence_raw) if sequence_raw.isdigit() else None
-
-          subcategory_dict[normalized_key] = {
-            "category": category,
-            "name": value,
-            "sequence": sequence,
-          }
-
-      # Convert to model instances
-      subcategories_to_create = [
-        SubCategory(
-          category=data["category"],
-          name=data["name"],
-          sequence=data["sequence"],
-        )
-        for data in subcategory_dict.values()
-      ]
-
-      SubCategory.objects.bulk_create(subcategories_to_create)
-
-      # Build upload message
-      success_count = len(subcategories_to_create)
-      if not_added:
-        upload_message = (
-          f"✅ Uploaded {success_count} subcategories.\n"
-          f"⚠️ Skipped {len(not_added)} subcategories:\n"
-          + ", ".join(not_added)
-        )
-      else:
-        upload_message = f"✅ Successfully uploaded all {success_count} unique subcategories from CSV."
-
-      subcategories = SubCategory.objects.select_related("category").all()
+      # Import in the background, home.html polls the job for progress
+      job = enqueue_import(ImportJob.SUBCATEGORY, csv_file, import_mode(request))
 
   return render(
     request,
     "home.html",
     {
-      "subcategories": subcategories,
+      "subcategory_job": job,
       "subcategory_message": upload_message,
     },
   )
 
-def generate_category_excel(request):
-  # Create workbook and sheet
-  wb = openpyxl.Workbook()
-  ws = wb.active
-  ws.title = "Categories"
-
-  # Define column headers
-  headers = [
-    "Dependent value",
-    "Element",
-    "Hint",
-    "Inactive",
-    "Label",
-    "Language",
-    "Sequence",
-    "Synonyms",
-    "Value",
-  ]
-
-  # Write header row
-  for col_num, header in enumerate(headers, 1):
-    ws.cell(row=1, column=col_num, value=header)
-
-  # Populate rows from Category model
-  categories = Category.objects.all().order_by("sequence", "name")
-
-  row_num = 2
-  for cat in categories:
-    ws.cell(row=row_num, column=1, value=None)          # Dependent value
-    ws.cell(row=row_num, column=2, value="category")    # Element
-    ws.cell(row=row_num, column=3, value=None)          # Hint
-    ws.cell(row=row_num, column=4, value="FALSE")       # Inactive
-    ws.cell(row=row_num, column=5, value=cat.name)      # Label
-    ws.cell(row=row_num, column=6, value=None)          # Language
-    ws.cell(row=row_num, column=7, value=cat.sequence)  # Sequence
-    ws.cell(row=row_num, column=8, value=None)          # Synonyms
-    ws.cell(row=row_num, column=9, value=cat.name)      # Value
-    row_num += 1
-
-  # Prepare HTTP response with Excel file
-  response = HttpResponse(
-    content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-  )
-  response["Content-Disposition"] = 'attachment; filename="categories.xlsx"'
-  wb.save(response)
+# Import kind -> (upload field, row validator)
+VALIDATORS = {
+  ImportJob.CATEGORY: ("category_csv_file", iter_category_validation),
+  ImportJob.SUBCATEGORY: ("subcategory_csv_file", iter_subcategory_validation),
+}
+
+def iter_ndjson(results):
+  # One JSON object per line, grouped into STREAM_CHUNK_SIZE chunks
+  chunk = []
+  size = 0
+  for result in results:
+    data = (json.dumps(result) + "\n").encode("utf-8")
+    chunk.append(data)
+    size += len(data)
+    if size >= STREAM_CHUNK_SIZE:
+      yield b"".join(chunk)
+      chunk = []
+      size = 0
+  if chunk:
+    yield b"".join(chunk)
+
+def validation_chunks(request, kind):
+  # NDJSON report for the uploaded file, or None when there is no valid file
+  field, validate = VALIDATORS[kind]
+  uploaded_file = request.FILES.get(field)
+  if uploaded_file is None or not is_import_file(uploaded_file.name):
+    return None
+  read_rows = ROW_READERS[os.path.splitext(uploaded_file.name)[1].lower()]
+  # Rows are parsed as the response is sent, the upload stays open until then
+  return iter_ndjson(validate(read_rows(uploaded_file)))
+
+def validation_response(chunks, kind):
+  response = StreamingHttpResponse(chunks, content_type="application/x-ndjson")
+  response["Content-Disposition"] = content_disposition_header(True, f"{kind}_validation.ndjson")
   return response
 
-def generate_subcategory_excel(request):
-  # Create workbook and sheet
-  wb = openpyxl.Workbook()
-  ws = wb.active
-  ws.title = "Subcategories"
-
-  # Define column headers
-  headers = [
-    "Dependent value",
-    "Element",
-    "Hint",
-    "Inactive",
-    "Label",
-    "Language",
-    "Sequence",
-    "Synonyms",
-    "Value",
-  ]
-
-  # Write header row
-  for col_num, header in enumerate(headers, 1):
-    ws.cell(row=1, column=col_num, value=header)
-
-  # Retrieve all subcategories, ordered cleanly
-  subcategories = (
-    SubCategory.objects
-    .select_related("category")
-    .order_by("category__sequence", "category__name", "sequence", "name")
-  )
+def validate_import(request, kind):
+  # Dry run of an upload: streams a line per row (accepted, duplicate, inactive,
+  # missing_category) and a summary line, without touching the tables
+  if kind not in VALIDATORS:
+    raise Http404("Unknown import kind")
+  if request.method != "POST":
+    return JsonResponse({"error": "POST the file to validate."}, status=405)
 
-  row_num = 2
-  for sub in subcategories:
-    ws.cell(row=row_num, column=1, value=sub.category.name)  # Dependent value (parent Category)
-    ws.cell(row=row_num, column=2, value="subcategory")       # Element
-    ws.cell(row=row_num, column=3, value=None)                # Hint
-    ws.cell(row=row_num, column=4, value="FALSE")             # Inactive
-    ws.cell(row=row_num, column=5, value=sub.name)            # Label
-    ws.cell(row=row_num, column=6, value=None)                # Language
-    ws.cell(row=row_num, column=7, value=sub.sequence)        # Sequence
-    ws.cell(row=row_num, column=8, value=None)                # Synonyms
-    ws.cell(row=row_num, column=9, value=sub.name)            # Value
-    row_num += 1
-
-  # Prepare HTTP response with Excel file
-  response = HttpResponse(
-    content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-  )
-  response["Content-Disposition"] = 'attachment; filename="subcategories.xlsx"'
-  wb.save(response)
-  return response
+  chunks = validation_chunks(request, kind)
+  if chunks is None:
+    return JsonResponse({"error": "Please upload a valid CSV or Excel (.xlsx) file."}, status=400)
+  return validation_response(chunks, kind)
 
-def build_category_based_on_subcat_string(category_based_on_subcat, all_categories):
-  js = []
-  js.append("function onChange(isLoading) {")
-  js.append("    if (isLoading) {")
-  js.append("        return;")
-  js.append("    }")
-  js.append("")
-
-  # Dump allCategories as JSON (safe for JS)
-  js.append(f"  var allCategories = {json.dumps(all_categories)};")
-  js.append("")
-  js.append("  var subCat = g_form.getValue('subcategory');")
-  js.append("  var category = g_form.getControl('category');")
-  js.append("")
-  js.append("  g_form.clearOptions('category');")
-  js.append("")
-  js.append("  switch (subCat) {")
-  js.append('    case "":')
-  js.append("      addOptions(category, allCategories);")
-  js.append("      break;")
-  js.append("")
-
-  # Loop through mappings to create cases
-  for sub, cats in category_based_on_subcat.items():
-    if sub == '':
-      continue
-    case_line = f'    case "{sub}":'
-    options = json.dumps([''] + cats)  
-    js.append(case_line)
-    js.append(f"      addOptions(category, {options});")
-    js.append("      break;")
-    js.append("")
-
-  js.append("  }")
-  js.append("")
-  js.append("  function addOptions(element, options) {")
-  js.append("    options.forEach(function(option) {")
-  js.append("      var label = option === '' ? '-- None --' : option;")
-  js.append("      g_form.addOption('category', option, label);")
-  js.append("    });")
-  js.append("  }")
-  js.append("}")
-
-  return "\n".join(js)
-
-def build_subcategory_based_on_category_string(subcat_based_on_category, all_subcategories):
-  js = []
-  js.append("function onChange(isLoading) {")
-  js.append("    if (isLoading) {")
-  js.append("        return;")
-  js.append("    }")
-  js.append("")
-
-  # Dump allCategories as JSON (safe for JS)
-  js.append(f"  var allSubCategories = {json.dumps(all_subcategories)};")
-  js.append("")
-  js.append("  var category = g_form.getValue('category');")
-  js.append("  var subCat = g_form.getControl('subcategory');")
-  js.append("")
-  js.append("  g_form.clearOptions('subcategory');")
-  js.append("")
-  js.append("  switch (category) {")
-  js.append('    case "":')
-  js.append("      addOptions(subCat, allSubCategories);")
-  js.append("      break;")
-  js.append("")
-
-  # Loop through mappings to create cases
-  for cat, subs in subcat_based_on_category.items():
-    if cat == '':
-      continue
-    case_line = f'    case "{cat}":'
-    options = json.dumps([''] + subs)  
-    js.append(case_line)
-    js.append(f"      addOptions(subcategory, {options});")
-    js.append("      break;")
-    js.append("")
-    
+def import_job_status(request, pk):
+  job = get_object_or_404(ImportJob, pk=pk)
+  return JsonResponse(job_status(job))
 
-  js.append("  }")
-  js.append("")
-  js.append("  function addOptions(element, options) {")
-  js.append("    options.forEach(function(option) {")
-  js.append("      var label = option === '' ? '-- None --' : option;")
-  js.append("      g_form.addOption('subcategory', option, label);")
-  js.append("    });")
-  js.append("  }")
-  js.append("}")
+def generate_category_excel(request):
+  return excel_response("Categories", "categories.xlsx", category_export_rows())
 
-  return "\n".join(js)
+def generate_subcategory_excel(request):
+  return excel_response("Subcategories", "subcategories.xlsx", subcategory_export_rows())
 
+def script_format(request):
+  # ?format=compact emits a lookup table instead of a switch, &minify=1 strips whitespace
+  compact = request.GET.get("format") == "compact"
+  minify = compact and request.GET.get("minify") == "1"
+  return compact, minify
+
+# Browsers revalidate on every click and get a 304 while the catalog is unchanged
+@cache_control(no_cache=True)
+@condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
 def generate_scripts(request):
-  categories = Category.objects.all()
-  subcategories = SubCategory.objects.select_related("category").all()
-
-  # List of all categories and subcategories 
-  all_categories = [''] + [cat.name for cat in categories]
-  all_subcategories = [''] + [sub.name for sub in subcategories]
-  
-  # Create defaultdict to hold category/subcategory mappings
-  subcat_based_on_category = defaultdict(list)
-  category_based_on_subcat = defaultdict(list)
-
-  # Map subcategories to their categories and vice versa
-  for sub in subcategories:
-    subcat_based_on_category[sub.category.name].append(sub.name)
-    category_based_on_subcat[sub.name].append(sub.category.name)
-
-  # Build JS strings
-  category_based_on_subcat_string = build_category_based_on_subcat_string(category_based_on_subcat, all_categories)
-  subcat_based_on_category_string = build_subcategory_based_on_category_string(subcat_based_on_category, all_subcategories)
-
-  return JsonResponse({
-    "category_based_on_subcat_script": category_based_on_subcat_string,
-    "subcat_based_on_category_script": subcat_based_on_category_string,
-  })
\ No newline at end of file
+  compact, minify = script_format(request)
+  version = record_revision()
+  response = JsonResponse(get_cached_scripts(compact, minify))
+  # What to pass as ?since= to script_patch next time
+  response["X-Catalog-Version"] = version
+  return response
+
+@cache_control(no_cache=True)
+@condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
+def download_script(request, script):
+  # Stream one script as a .js file (gzipped when the client accepts it) or both as a .zip
+  compact, minify = script_format(request)
+
+  if script == "all":
+    version = record_revision()
+    response = StreamingHttpResponse(
+      iter_scripts_zip(load_script_mappings(), compact, minify), content_type="application/zip"
+    )
+    response["Content-Disposition"] = 'attachment; filename="scripts.zip"'
+    response["X-Catalog-Version"] = version
+    return response
+
+  if script not in SCRIPT_SOURCES:
+    raise Http404("Unknown script")
+
+  version = record_revision()
+  chunks = iter_script_bytes(script, load_script_mappings(), compact, minify)
+  gzipped = ACCEPTS_GZIP_RE.search(request.headers.get("Accept-Encoding", ""))
+  if gzipped:
+    chunks = iter_gzip(chunks)
+
+  response = StreamingHttpResponse(chunks, content_type="application/javascript; charset=utf-8")
+  if gzipped:
+    response["Content-Encoding"] = "gzip"
+  patch_vary_headers(response, ("Accept-Encoding",))
+  response["Content-Disposition"] = f'attachment; filename="{SCRIPT_SOURCES[script][0]}"'
+  response["X-Catalog-Version"] = version
+  return response
+
+@cache_control(no_cache=True)
+@condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
+def script_patch(request):
+  # Switch cases that changed since ?since=<X-Catalog-Version of the scripts the client has>
+  since = request.GET.get("since", "")
+  if not since.isdigit():
+    return JsonResponse({"error": "Pass ?since=<catalog version>."}, status=400)
+  patch = get_script_patch(int(since))
+  if patch is None:
+    # Never served or pruned, nothing to diff against
+    return JsonResponse({"error": "Unknown catalog version, download the full scripts."}, status=410)
+  return JsonResponse(patch)
+
+def metrics(request):
+  # Prometheus scrape endpoint, numbers are per worker process
+  return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")